@@ -11,16 +11,27 @@
 #
 # Install:  pip install -U discord.py
 # Token:    set DISCORD_TOKEN env var
-# Run:      python economy_bot.py
+# Sync:     commands sync per guild on startup (stale global registrations are
+#           cleared); set SYNC_GLOBAL_COMMANDS=1 to register them globally instead
+# Run:      python economy_bot.py  (logs go to stderr through a queue; set
+#           PYTHONUNBUFFERED=1 when attaching py-spy/cProfile)
 
 import os
 import time
 import random
+import re
 import sqlite3
 import asyncio
 import itertools
-from dataclasses import dataclass
-from typing import Optional, List, Union, Dict, Tuple
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, List, Union, Dict, Tuple, Iterator, Set, Callable
 
 import discord
 from discord import app_commands
@@ -30,11 +41,15 @@ from discord.ext import commands
 # CONFIG
 # ----------------------------
 DB_PATH = "/app/data/economy.sqlite3"
+DB_POOL_SIZE = 4
+SYNC_GLOBAL_COMMANDS = os.getenv("SYNC_GLOBAL_COMMANDS", "0") == "1"
 DAILY_AMOUNT = 250
 DAILY_COOLDOWN_SECONDS = 24 * 60 * 60  # 24h
 DAILY_STREAK_GRACE_SECONDS = 48 * 60 * 60
 
 STREAK_BONUS = {3: 100, 7: 250, 14: 500, 30: 1500}
+# indexed by streak; streaks past the last milestone earn no bonus
+_STREAK_BONUS_ARR = tuple(STREAK_BONUS.get(i, 0) for i in range(max(STREAK_BONUS) + 1))
 
 MIN_BET = 10
 MAX_BET = 100_000
@@ -79,6 +94,26 @@ INCOME_DAILY_PCT = 1                 # 1% of collectible portfolio value per day
 INCOME_DAILY_CAP = 250_000           # max coins per day from income (change this)
 INCOME_DAY_SECONDS = 24 * 60 * 60    # accrues in full-day chunks
 
+log = logging.getLogger("econ")
+
+def setup_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """
+    Handlers only enqueue records; a background listener thread does the
+    formatting and stream writes, so the event loop never blocks on stderr.
+    """
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(q, stream)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(q))
+    listener.start()
+    return listener
+
+# Dedicated RNG instance for all gameplay draws (roulette, slots, cards, bot)
+_rng = random.Random()
+
 # ----------------------------
 # ROULETTE HELPERS
 # ----------------------------
@@ -86,17 +121,25 @@ RED_NUMBERS = {
     1, 3, 5, 7, 9, 12, 14, 16, 18,
     19, 21, 23, 25, 27, 30, 32, 34, 36
 }
+# bit n set <=> pocket n is red (0..36 fits in one int)
+_RED_MASK = sum(1 << n for n in RED_NUMBERS)
 
 Pocket = Union[int, str]  # int 0..36, or "00"
 POCKETS: List[Pocket] = ["00", 0] + list(range(1, 37))
+_POCKETS_TUPLE: Tuple[Pocket, ...] = tuple(POCKETS)
+
+# per-pocket lookup tables, built once at import
+_POCKET_COLOR: Dict[Pocket, str] = {
+    p: ("green" if p == "00" or p == 0 else ("red" if (_RED_MASK >> p) & 1 else "black"))
+    for p in POCKETS
+}
+_POCKET_FMT: Dict[Pocket, str] = {p: ("00" if p == "00" else str(p)) for p in POCKETS}
 
 def pocket_color(p: Pocket) -> str:
-    if p == "00" or p == 0:
-        return "green"
-    return "red" if int(p) in RED_NUMBERS else "black"
+    return _POCKET_COLOR[p]
 
 def fmt_pocket(p: Pocket) -> str:
-    return "00" if p == "00" else str(p)
+    return _POCKET_FMT[p]
 
 def loss_fee(bet: int) -> int:
     if ROULETTE_LOSS_FEE_PCT <= 0:
@@ -106,20 +149,142 @@ def loss_fee(bet: int) -> int:
 # ----------------------------
 # DATABASE
 # ----------------------------
-def db_connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+# Small pool of long-lived connections (opened lazily up to DB_POOL_SIZE, PRAGMAs applied once each).
+# Keeps SQLite's page caches warm between commands and lets worker threads read concurrently under WAL;
+# writers still serialize on BEGIN IMMEDIATE.
+_POOL: "queue.SimpleQueue[sqlite3.Connection]" = queue.SimpleQueue()
+_POOL_LOCK = threading.Lock()
+_pool_opened = 0
+_db_local = threading.local()   # .conn = connection checked out by this thread, if any; .lb_dirty, see mark_lb_dirty
+
+def _open_db() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False, timeout=5.0, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA page_size=8192")       # only takes effect on a fresh file, so before WAL
+    mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    if mode.lower() != "wal":
+        # e.g. network filesystems; every commit then pays the rollback-journal fsync
+        log.warning("SQLite refused WAL for %s (journal_mode=%s)", DB_PATH, mode)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA cache_size=-16384")   # 16 MiB per pooled connection
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 MiB; reads come straight from the OS page cache
+    conn.execute("PRAGMA foreign_keys=ON")
     return conn
 
+def _checkout() -> sqlite3.Connection:
+    global _pool_opened
+    try:
+        return _POOL.get_nowait()
+    except queue.Empty:
+        pass
+    with _POOL_LOCK:
+        grow = _pool_opened < DB_POOL_SIZE
+        if grow:
+            _pool_opened += 1
+    if grow:
+        try:
+            return _open_db()
+        except BaseException:
+            with _POOL_LOCK:
+                _pool_opened -= 1
+            raise
+    return _POOL.get()
+
+def _warm_pool() -> None:
+    # open every pooled connection up front so the first commands don't pay for sqlite3_open + PRAGMAs
+    conns = [_checkout() for _ in range(DB_POOL_SIZE)]
+    for conn in conns:
+        _POOL.put(conn)
+
+@contextmanager
+def db_connect() -> Iterator[sqlite3.Connection]:
+    """
+    Checks a pooled connection out for this thread. Commits any open
+    transaction on exit (rolls back on error) and returns the connection
+    to the pool instead of closing it. Nested use on the same thread
+    shares the outer checkout.
+    """
+    conn = getattr(_db_local, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+
+    conn = _checkout()
+    _db_local.conn = conn
+    _db_local.lb_dirty = set()
+    try:
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        if conn.in_transaction:
+            conn.commit()
+    finally:
+        _db_local.conn = None
+        _POOL.put(conn)
+        # after the commit, so a concurrent /leaderboard can't re-cache the pre-commit rows
+        for key in _db_local.lb_dirty:
+            _lb_cache.pop(key, None)
+
+def mark_lb_dirty(guild_id: int, *metrics: str) -> None:
+    # writers of leaderboard columns call this; db_connect drops the cached pages on exit
+    _db_local.lb_dirty.update((guild_id, m) for m in metrics)
+
+@contextmanager
+def tx(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """
+    One write transaction per command. Early exits may still call
+    conn.commit()/conn.rollback() themselves before replying.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    if conn.in_transaction:
+        conn.execute("COMMIT")
+
+async def _db(fn, *args):
+    """Run a blocking DB function on a worker thread so the event loop keeps serving interactions."""
+    return await asyncio.to_thread(fn, *args)
+
 def _colnames(conn: sqlite3.Connection, table: str) -> set:
     return {r["name"] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
 
+_ID_COLS = ("guild_id", "user_id")
+
+def _migrate_text_ids(conn: sqlite3.Connection, table: str) -> None:
+    """
+    Older databases stored snowflakes as TEXT. Rebuild such a table with
+    INTEGER id columns (new table -> copy with CAST -> drop -> rename).
+    Indexes on the old table go with it and are recreated by db_init.
+    """
+    info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    if not any(r["name"] in _ID_COLS and r["type"].upper() == "TEXT" for r in info):
+        return
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()["sql"]
+    new_sql = sql.replace(f"CREATE TABLE {table}", f"CREATE TABLE {table}_new", 1)
+    for col in _ID_COLS:
+        new_sql = re.sub(rf"\b{col}(\s+)TEXT\b", rf"{col}\1INTEGER", new_sql)
+    cols = [r["name"] for r in info]
+    select = ", ".join(f"CAST({c} AS INTEGER)" if c in _ID_COLS else c for c in cols)
+    conn.execute(new_sql)
+    conn.execute(f"INSERT INTO {table}_new ({', '.join(cols)}) SELECT {select} FROM {table}")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
 def db_init() -> None:
-    with db_connect() as conn:
+    with db_connect() as conn, tx(conn):
         conn.execute("""
         CREATE TABLE IF NOT EXISTS guild_users (
-            guild_id   TEXT NOT NULL,
-            user_id    TEXT NOT NULL,
+            guild_id   INTEGER NOT NULL,
+            user_id    INTEGER NOT NULL,
             wallet     INTEGER NOT NULL DEFAULT 0,
 
             -- Daily
@@ -168,15 +333,13 @@ def db_init() -> None:
             PRIMARY KEY (guild_id, user_id)
         )
         """)
-        conn.commit()
 
         conn.execute("""
         CREATE TABLE IF NOT EXISTS guild_settings (
-            guild_id TEXT PRIMARY KEY,
+            guild_id INTEGER PRIMARY KEY,
             achievements_enabled INTEGER NOT NULL DEFAULT 1
         )
         """)
-        conn.commit()
 
         # Collectible items (global)
         conn.execute("""
@@ -188,18 +351,16 @@ def db_init() -> None:
             description TEXT NOT NULL DEFAULT ''
         )
         """)
-        conn.commit()
 
         conn.execute("""
         CREATE TABLE IF NOT EXISTS inventory (
-            guild_id TEXT NOT NULL,
-            user_id  TEXT NOT NULL,
+            guild_id INTEGER NOT NULL,
+            user_id  INTEGER NOT NULL,
             item_id  TEXT NOT NULL,
             qty      INTEGER NOT NULL DEFAULT 0,
             PRIMARY KEY (guild_id, user_id, item_id)
         )
         """)
-        conn.commit()
 
         conn.execute("""
         CREATE TABLE IF NOT EXISTS achievements (
@@ -209,24 +370,22 @@ def db_init() -> None:
             reward INTEGER NOT NULL DEFAULT 0
         )
         """)
-        conn.commit()
 
         conn.execute("""
         CREATE TABLE IF NOT EXISTS user_achievements (
-            guild_id TEXT NOT NULL,
-            user_id  TEXT NOT NULL,
+            guild_id INTEGER NOT NULL,
+            user_id  INTEGER NOT NULL,
             ach_id   TEXT NOT NULL,
             unlocked_at INTEGER NOT NULL,
             PRIMARY KEY (guild_id, user_id, ach_id)
         )
         """)
-        conn.commit()
 
         # Loans (per-guild)
         conn.execute("""
         CREATE TABLE IF NOT EXISTS loans (
-            guild_id TEXT NOT NULL,
-            user_id  TEXT NOT NULL,
+            guild_id INTEGER NOT NULL,
+            user_id  INTEGER NOT NULL,
             principal INTEGER NOT NULL DEFAULT 0,   -- original borrowed (for reference)
             balance   INTEGER NOT NULL DEFAULT 0,   -- current owed (compounds)
             daily_interest_pct INTEGER NOT NULL DEFAULT 0,
@@ -236,11 +395,14 @@ def db_init() -> None:
             PRIMARY KEY (guild_id, user_id)
         )
         """)
-        conn.commit()
 
         seed_items(conn)
         seed_achievements(conn)
 
+        # migrations: TEXT snowflakes -> INTEGER
+        for table in ("guild_users", "guild_settings", "inventory", "user_achievements", "loans"):
+            _migrate_text_ids(conn, table)
+
         # migrations (safe adds)
         existing_cols = _colnames(conn, "guild_users")
         add_cols = {
@@ -263,7 +425,16 @@ def db_init() -> None:
         for col, ddl in add_cols.items():
             if col not in existing_cols:
                 conn.execute(f"ALTER TABLE guild_users ADD COLUMN {col} {ddl}")
-        conn.commit()
+
+        # leaderboard indexes (after migrations so every column exists)
+        for col in _LB_METRICS:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS ix_gu_guild_{col} ON guild_users(guild_id, {col} DESC)")
+        # inventory / user_achievements lookups are already covered by their (guild_id, user_id, ...) PKs
+
+        # refresh planner statistics so the indexes above get picked
+        conn.execute("ANALYZE")
+
+    _warm_pool()
 
 def seed_items(conn: sqlite3.Connection) -> None:
     items = [
@@ -300,11 +471,10 @@ def seed_items(conn: sqlite3.Connection) -> None:
     ]
 
     # normal seed (adds missing items only)
-    for item_id, name, price, kind, desc in items:
-        conn.execute("""
-            INSERT OR IGNORE INTO items (item_id, name, price, kind, description)
-            VALUES (?, ?, ?, ?, ?)
-        """, (item_id, name, price, kind, desc))
+    conn.executemany("""
+        INSERT OR IGNORE INTO items (item_id, name, price, kind, description)
+        VALUES (?, ?, ?, ?, ?)
+    """, items)
 
     # --- FORCE PRICE UPDATES for existing rows ---
     UPDATED_PRICES = {
@@ -332,10 +502,10 @@ def seed_items(conn: sqlite3.Connection) -> None:
         # c_029 and c_030 intentionally NOT included (two most expensive stay unchanged)
     }
 
-    for item_id, new_price in UPDATED_PRICES.items():
-        conn.execute("UPDATE items SET price = ? WHERE item_id = ?", (new_price, item_id))
-
-    conn.commit()
+    conn.executemany(
+        "UPDATE items SET price = ? WHERE item_id = ?",
+        [(new_price, item_id) for item_id, new_price in UPDATED_PRICES.items()]
+    )
 
 def seed_achievements(conn: sqlite3.Connection) -> None:
     ach = [
@@ -354,68 +524,121 @@ def seed_achievements(conn: sqlite3.Connection) -> None:
 
         ("holdem_win", "River King", "Win a hand of Texas Hold'em.", 600),
     ]
-    for ach_id, name, desc, reward in ach:
-        conn.execute("""
-            INSERT OR IGNORE INTO achievements (ach_id, name, description, reward)
-            VALUES (?, ?, ?, ?)
-        """, (ach_id, name, desc, reward))
-    conn.commit()
+    conn.executemany("""
+        INSERT OR IGNORE INTO achievements (ach_id, name, description, reward)
+        VALUES (?, ?, ?, ?)
+    """, ach)
+
+# Hot-path statements, one text each so every caller hits the same entry in the
+# connection's statement cache (cached_statements=256 in _open_db).
+_SQL_ENSURE_USER = "INSERT OR IGNORE INTO guild_users (guild_id, user_id) VALUES (?, ?)"
+_SQL_GET_USER = "SELECT * FROM guild_users WHERE guild_id=? AND user_id=?"
+_SQL_UPDATE_WALLET = """
+    INSERT INTO guild_users (guild_id, user_id, wallet)
+    VALUES (?, ?, ?)
+    ON CONFLICT(guild_id, user_id) DO UPDATE SET wallet = wallet + excluded.wallet
+    RETURNING wallet
+"""
+# apply a delta only if it doesn't take the wallet below zero; no row back means it didn't.
+# Plain UPDATE: a user without a guild_users row yet also gets no row back, whatever the sign.
+_SQL_TRY_WALLET_DELTA = """
+    UPDATE guild_users SET wallet = wallet + ?
+    WHERE guild_id=? AND user_id=? AND (? >= 0 OR wallet + ? >= 0)
+    RETURNING wallet
+"""
 
 def ensure_user(conn: sqlite3.Connection, guild_id: int, user_id: int) -> None:
-    conn.execute("""
-        INSERT OR IGNORE INTO guild_users (guild_id, user_id)
-        VALUES (?, ?)
-    """, (str(guild_id), str(user_id)))
+    conn.execute(_SQL_ENSURE_USER, (guild_id, user_id))
+
+# guilds whose guild_settings row is known to exist (per process)
+_settings_seeded: Set[int] = set()
 
 def ensure_settings(conn: sqlite3.Connection, guild_id: int) -> None:
+    if guild_id in _settings_seeded:
+        return
     conn.execute("""
         INSERT OR IGNORE INTO guild_settings (guild_id, achievements_enabled)
         VALUES (?, 1)
-    """, (str(guild_id),))
+    """, (guild_id,))
+    _settings_seeded.add(guild_id)
+
+def prime_guild_settings(guild_id: int) -> None:
+    with db_connect() as conn:
+        ensure_settings(conn, guild_id)
+
+# guild_id -> (achievements_enabled, expires at). /settings achievements writes through; the TTL
+# bounds staleness if that write rolls back or a pooled reader re-caches the pre-commit value.
+ACH_ENABLED_TTL_SECONDS = 30.0
+_ach_enabled_cache: Dict[int, Tuple[bool, float]] = {}
 
 def achievements_enabled(conn: sqlite3.Connection, guild_id: int) -> bool:
+    now = time.monotonic()
+    cached = _ach_enabled_cache.get(guild_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
     ensure_settings(conn, guild_id)
-    row = conn.execute("SELECT achievements_enabled FROM guild_settings WHERE guild_id=?", (str(guild_id),)).fetchone()
-    return bool(int(row["achievements_enabled"]))
+    row = conn.execute("SELECT achievements_enabled FROM guild_settings WHERE guild_id=?", (guild_id,)).fetchone()
+    enabled = True if row is None else bool(int(row["achievements_enabled"]))  # default matches the column
+    _ach_enabled_cache[guild_id] = (enabled, now + ACH_ENABLED_TTL_SECONDS)
+    return enabled
 
 def set_achievements_enabled(conn: sqlite3.Connection, guild_id: int, enabled: bool) -> None:
     ensure_settings(conn, guild_id)
-    conn.execute("UPDATE guild_settings SET achievements_enabled=? WHERE guild_id=?", (1 if enabled else 0, str(guild_id),))
+    conn.execute("UPDATE guild_settings SET achievements_enabled=? WHERE guild_id=?", (1 if enabled else 0, guild_id))
+    _ach_enabled_cache[guild_id] = (enabled, time.monotonic() + ACH_ENABLED_TTL_SECONDS)
 
 def get_user(conn: sqlite3.Connection, guild_id: int, user_id: int) -> sqlite3.Row:
     ensure_user(conn, guild_id, user_id)
-    return conn.execute("SELECT * FROM guild_users WHERE guild_id=? AND user_id=?", (str(guild_id), str(user_id))).fetchone()
+    return conn.execute(_SQL_GET_USER, (guild_id, user_id)).fetchone()
+
+def peek_user(conn: sqlite3.Connection, guild_id: int, user_id: int) -> Optional[sqlite3.Row]:
+    # read-only get_user for display paths: no INSERT, so no write lock; None if the row doesn't exist
+    return conn.execute(_SQL_GET_USER, (guild_id, user_id)).fetchone()
 
 def update_wallet(conn: sqlite3.Connection, guild_id: int, user_id: int, delta: int) -> int:
-    ensure_user(conn, guild_id, user_id)
-    conn.execute("UPDATE guild_users SET wallet = wallet + ? WHERE guild_id=? AND user_id=?", (delta, str(guild_id), str(user_id)))
-    row = conn.execute("SELECT wallet FROM guild_users WHERE guild_id=? AND user_id=?", (str(guild_id), str(user_id))).fetchone()
-    return int(row["wallet"])
+    # upsert + read back in one statement (creates the row if missing)
+    mark_lb_dirty(guild_id, "wallet")
+    return int(conn.execute(_SQL_UPDATE_WALLET, (guild_id, user_id, delta)).fetchone()["wallet"])
+
+def take_wallet_clamped(conn: sqlite3.Connection, guild_id: int, user_id: int, amount: int) -> Tuple[int, int]:
+    """
+    Take up to `amount`, flooring the wallet at 0 -> (taken, new wallet).
+    Call inside tx(): the read and the write must see the same balance.
+    """
+    row = conn.execute("SELECT wallet FROM guild_users WHERE guild_id=? AND user_id=?", (guild_id, user_id)).fetchone()
+    if row is None or int(row["wallet"]) <= 0:
+        return 0, 0  # nothing to take: no row is inserted and nothing is written
+    new_wallet = int(conn.execute(
+        "UPDATE guild_users SET wallet = MAX(wallet - ?, 0) WHERE guild_id=? AND user_id=? RETURNING wallet",
+        (amount, guild_id, user_id),
+    ).fetchone()["wallet"])
+    mark_lb_dirty(guild_id, "wallet")
+    return int(row["wallet"]) - new_wallet, new_wallet
 
 def set_last_daily(conn: sqlite3.Connection, guild_id: int, user_id: int, ts: int) -> None:
     ensure_user(conn, guild_id, user_id)
-    conn.execute("UPDATE guild_users SET last_daily=? WHERE guild_id=? AND user_id=?", (ts, str(guild_id), str(user_id)))
+    conn.execute("UPDATE guild_users SET last_daily=? WHERE guild_id=? AND user_id=?", (ts, guild_id, user_id))
 
 def set_daily_streak(conn: sqlite3.Connection, guild_id: int, user_id: int, streak: int) -> None:
     ensure_user(conn, guild_id, user_id)
-    conn.execute("UPDATE guild_users SET daily_streak=? WHERE guild_id=? AND user_id=?", (streak, str(guild_id), str(user_id)))
+    conn.execute("UPDATE guild_users SET daily_streak=? WHERE guild_id=? AND user_id=?", (streak, guild_id, user_id))
 
 def set_last_beg(conn: sqlite3.Connection, guild_id: int, user_id: int, ts: int) -> None:
     ensure_user(conn, guild_id, user_id)
-    conn.execute("UPDATE guild_users SET last_beg=? WHERE guild_id=? AND user_id=?", (ts, str(guild_id), str(user_id)))
+    conn.execute("UPDATE guild_users SET last_beg=? WHERE guild_id=? AND user_id=?", (ts, guild_id, user_id))
 
 def set_beg_bonus_ready(conn: sqlite3.Connection, guild_id: int, user_id: int, ready: bool) -> None:
     ensure_user(conn, guild_id, user_id)
     conn.execute(
         "UPDATE guild_users SET beg_bonus_ready=? WHERE guild_id=? AND user_id=?",
-        (1 if ready else 0, str(guild_id), str(user_id))
+        (1 if ready else 0, guild_id, user_id)
     )
 
 def set_last_income_claim(conn: sqlite3.Connection, guild_id: int, user_id: int, ts: int) -> None:
     ensure_user(conn, guild_id, user_id)
     conn.execute(
         "UPDATE guild_users SET last_income_claim=? WHERE guild_id=? AND user_id=?",
-        (ts, str(guild_id), str(user_id))
+        (ts, guild_id, user_id)
     )
 
 def compute_income_due(conn: sqlite3.Connection, guild_id: int, user_id: int, now: int) -> Tuple[int, int, int, int]:
@@ -431,7 +654,7 @@ def compute_income_due(conn: sqlite3.Connection, guild_id: int, user_id: int, no
         FROM inventory i
         JOIN items it ON it.item_id = i.item_id
         WHERE i.guild_id=? AND i.user_id=? AND i.qty > 0 AND it.kind='collectible'
-    """, (str(guild_id), str(user_id))).fetchone()
+    """, (guild_id, user_id)).fetchone()
 
     total_value = int(portfolio["total"] or 0)
     daily_raw = (total_value * INCOME_DAILY_PCT) // 100
@@ -451,12 +674,6 @@ def apply_roulette_stats(conn: sqlite3.Connection, guild_id: int, user_id: int,
     is_win = 1 if net > 0 else 0
     is_loss = 1 if net <= 0 else 0
 
-    current_biggest = int(conn.execute(
-        "SELECT biggest_win FROM guild_users WHERE guild_id=? AND user_id=?",
-        (str(guild_id), str(user_id))
-    ).fetchone()["biggest_win"])
-    new_biggest = max(current_biggest, net) if net > 0 else current_biggest
-
     conn.execute("""
         UPDATE guild_users
         SET plays = plays + 1,
@@ -464,9 +681,10 @@ def apply_roulette_stats(conn: sqlite3.Connection, guild_id: int, user_id: int,
             losses = losses + ?,
             wagered = wagered + ?,
             profit = profit + ?,
-            biggest_win = ?
+            biggest_win = MAX(biggest_win, ?)
         WHERE guild_id=? AND user_id=?
-    """, (is_win, is_loss, bet, net, new_biggest, str(guild_id), str(user_id)))
+    """, (is_win, is_loss, bet, net, net, guild_id, user_id))
+    mark_lb_dirty(guild_id, "profit", "wins")
 
 def apply_blackjack_stats(conn: sqlite3.Connection, guild_id: int, user_id: int, bet: int, net: int, outcome: str) -> None:
     ensure_user(conn, guild_id, user_id)
@@ -474,12 +692,6 @@ def apply_blackjack_stats(conn: sqlite3.Connection, guild_id: int, user_id: int,
     l = 1 if outcome == "loss" else 0
     p = 1 if outcome == "push" else 0
 
-    current_biggest = int(conn.execute(
-        "SELECT bj_biggest_win FROM guild_users WHERE guild_id=? AND user_id=?",
-        (str(guild_id), str(user_id))
-    ).fetchone()["bj_biggest_win"])
-    new_biggest = max(current_biggest, net) if net > 0 else current_biggest
-
     conn.execute("""
         UPDATE guild_users
         SET bj_plays = bj_plays + 1,
@@ -488,21 +700,16 @@ def apply_blackjack_stats(conn: sqlite3.Connection, guild_id: int, user_id: int,
             bj_pushes = bj_pushes + ?,
             bj_wagered = bj_wagered + ?,
             bj_profit = bj_profit + ?,
-            bj_biggest_win = ?
+            bj_biggest_win = MAX(bj_biggest_win, ?)
         WHERE guild_id=? AND user_id=?
-    """, (w, l, p, bet, net, new_biggest, str(guild_id), str(user_id)))
+    """, (w, l, p, bet, net, net, guild_id, user_id))
+    mark_lb_dirty(guild_id, "bj_profit", "bj_wins")
 
 def apply_slots_stats(conn: sqlite3.Connection, guild_id: int, user_id: int, bet: int, net: int) -> None:
     ensure_user(conn, guild_id, user_id)
     is_win = 1 if net > 0 else 0
     is_loss = 1 if net <= 0 else 0
 
-    current_biggest = int(conn.execute(
-        "SELECT slots_biggest_win FROM guild_users WHERE guild_id=? AND user_id=?",
-        (str(guild_id), str(user_id))
-    ).fetchone()["slots_biggest_win"])
-    new_biggest = max(current_biggest, net) if net > 0 else current_biggest
-
     conn.execute("""
         UPDATE guild_users
         SET slots_plays = slots_plays + 1,
@@ -510,9 +717,10 @@ def apply_slots_stats(conn: sqlite3.Connection, guild_id: int, user_id: int, bet
             slots_losses = slots_losses + ?,
             slots_wagered = slots_wagered + ?,
             slots_profit = slots_profit + ?,
-            slots_biggest_win = ?
+            slots_biggest_win = MAX(slots_biggest_win, ?)
         WHERE guild_id=? AND user_id=?
-    """, (is_win, is_loss, bet, net, new_biggest, str(guild_id), str(user_id)))
+    """, (is_win, is_loss, bet, net, net, guild_id, user_id))
+    mark_lb_dirty(guild_id, "slots_profit")
 
 def apply_holdem_stats(conn: sqlite3.Connection, guild_id: int, user_id: int, bet: int, net: int, won: bool) -> None:
     ensure_user(conn, guild_id, user_id)
@@ -524,51 +732,51 @@ def apply_holdem_stats(conn: sqlite3.Connection, guild_id: int, user_id: int, be
             he_wagered = he_wagered + ?,
             he_profit = he_profit + ?
         WHERE guild_id=? AND user_id=?
-    """, (1 if won else 0, 0 if won else 1, bet, net, str(guild_id), str(user_id)))
-
-def top_users(conn: sqlite3.Connection, guild_id: int, metric: str, limit: int = 10) -> List[sqlite3.Row]:
-    metric_sql = {
-        "wallet": "wallet",
-        "profit": "profit",
-        "wins": "wins",
-        "bj_profit": "bj_profit",
-        "bj_wins": "bj_wins",
-        "slots_profit": "slots_profit",
-        "he_profit": "he_profit",
-    }.get(metric, "wallet")
-
-    return conn.execute(f"""
-        SELECT user_id, wallet, profit, wins, bj_profit, bj_wins, slots_profit, he_profit
+    """, (1 if won else 0, 0 if won else 1, bet, net, guild_id, user_id))
+    mark_lb_dirty(guild_id, "he_profit")
+
+# leaderboard metrics are a closed set of guild_users columns, so each
+# statement is formatted once here and executed by dict lookup
+_LB_METRICS = ("wallet", "profit", "wins", "bj_profit", "bj_wins", "slots_profit", "he_profit")
+
+_TOP_RANK_SQL: Dict[str, str] = {m: f"""
+    WITH ranked AS (
+        SELECT user_id, CAST({m} AS INTEGER) AS v,  -- float payouts (e.g. 2.2x) store REAL values
+               ROW_NUMBER() OVER w AS rn,
+               RANK() OVER w AS rnk,
+               SUM({m} > 0) OVER () AS n_positive
         FROM guild_users
         WHERE guild_id = ?
-        ORDER BY {metric_sql} DESC
-        LIMIT ?
-    """, (str(guild_id), limit)).fetchall()
-
-def user_rank(conn: sqlite3.Connection, guild_id: int, user_id: int, metric: str) -> int:
-    metric_sql = {
-        "wallet": "wallet",
-        "profit": "profit",
-        "wins": "wins",
-        "bj_profit": "bj_profit",
-        "bj_wins": "bj_wins",
-        "slots_profit": "slots_profit",
-        "he_profit": "he_profit",
-    }.get(metric, "wallet")
+        WINDOW w AS (ORDER BY {m} DESC)
+    )
+    SELECT * FROM ranked WHERE rn <= ? OR user_id = ? ORDER BY rn
+""" for m in _LB_METRICS}
 
-    ensure_user(conn, guild_id, user_id)
+# same RANK() as top_users_with_rank, as an index range count (missing row ranks as 0)
+_RANK_SQL: Dict[str, str] = {m: f"""
+    SELECT COUNT(*) + 1 AS rnk FROM guild_users
+    WHERE guild_id = ? AND {m} > COALESCE(
+        (SELECT {m} FROM guild_users WHERE guild_id = ? AND user_id = ?), 0)
+""" for m in _LB_METRICS}
 
-    value = conn.execute(
-        f"SELECT {metric_sql} AS v FROM guild_users WHERE guild_id=? AND user_id=?",
-        (str(guild_id), str(user_id))
-    ).fetchone()["v"]
+def top_users_with_rank(conn: sqlite3.Connection, guild_id: int, user_id: int, metric: str, limit: int = 10) -> Tuple[List[sqlite3.Row], int]:
+    """
+    Top `limit` rows (user_id, v = the metric as an int) plus the caller's RANK(), from
+    one ranked scan. A caller without a row ranks like an all-zero row would.
+    """
+    sql = _TOP_RANK_SQL.get(metric) or _TOP_RANK_SQL["wallet"]
+    rows = conn.execute(sql, (guild_id, limit, user_id)).fetchall()
 
-    above = conn.execute(
-        f"SELECT COUNT(*) AS c FROM guild_users WHERE guild_id=? AND {metric_sql} > ?",
-        (str(guild_id), value)
-    ).fetchone()["c"]
+    top = [r for r in rows if r["rn"] <= limit]
+    mine = next((r for r in rows if r["user_id"] == user_id), None)
+    if mine is not None:
+        return top, int(mine["rnk"])
+    return top, (int(rows[0]["n_positive"]) if rows else 0) + 1
 
-    return int(above) + 1
+def user_rank(conn: sqlite3.Connection, guild_id: int, user_id: int, metric: str) -> int:
+    sql = _RANK_SQL.get(metric) or _RANK_SQL["wallet"]
+    row = conn.execute(sql, (guild_id, guild_id, user_id)).fetchone()
+    return int(row["rnk"])
 
 # ----------------------------
 # ACHIEVEMENTS
@@ -576,37 +784,55 @@ def user_rank(conn: sqlite3.Connection, guild_id: int, user_id: int, metric: str
 def has_achievement(conn: sqlite3.Connection, guild_id: int, user_id: int, ach_id: str) -> bool:
     row = conn.execute(
         "SELECT 1 FROM user_achievements WHERE guild_id=? AND user_id=? AND ach_id=?",
-        (str(guild_id), str(user_id), ach_id)
+        (guild_id, user_id, ach_id)
     ).fetchone()
     return row is not None
 
-def unlock_achievement(conn: sqlite3.Connection, guild_id: int, user_id: int, ach_id: str) -> Optional[int]:
-    if has_achievement(conn, guild_id, user_id, ach_id):
-        return None
-    ach = conn.execute("SELECT reward FROM achievements WHERE ach_id=?", (ach_id,)).fetchone()
-    if ach is None:
-        return None
-    reward = int(ach["reward"])
-    conn.execute("""
+def unlock_achievement(conn: sqlite3.Connection, guild_id: int, user_id: int, ach_id: str) -> Optional[Tuple[str, int]]:
+    """Returns (name, reward) if this call unlocked it, None if already unlocked (or unknown id)."""
+    row = conn.execute("""
         INSERT INTO user_achievements (guild_id, user_id, ach_id, unlocked_at)
-        VALUES (?, ?, ?, ?)
-    """, (str(guild_id), str(user_id), ach_id, int(time.time())))
-    return reward
-
-def list_user_achievements(conn: sqlite3.Connection, guild_id: int, user_id: int) -> List[sqlite3.Row]:
+        SELECT ?, ?, ach_id, ? FROM achievements WHERE ach_id = ?
+        ON CONFLICT DO NOTHING
+        RETURNING (SELECT name FROM achievements a WHERE a.ach_id = user_achievements.ach_id) AS name,
+                  (SELECT reward FROM achievements a WHERE a.ach_id = user_achievements.ach_id) AS reward
+    """, (guild_id, user_id, int(time.time()), ach_id)).fetchone()
+    return None if row is None else (row["name"], int(row["reward"]))
+
+def unlock_achievements(conn: sqlite3.Connection, guild_id: int, user_id: int, ach_ids: List[str]) -> List[Tuple[str, int]]:
+    """
+    Unlocks a whole candidate set in one statement. Returns (name, reward)
+    for the ones this call unlocked, in ach_ids order.
+    """
+    if not ach_ids:
+        return []
+    rows = conn.execute("""
+        INSERT INTO user_achievements (guild_id, user_id, ach_id, unlocked_at)
+        SELECT ?, ?, a.ach_id, ? FROM json_each(?) j JOIN achievements a ON a.ach_id = j.value
+        WHERE true  -- disambiguates JOIN ... ON from ON CONFLICT
+        ON CONFLICT DO NOTHING
+        RETURNING ach_id,
+                  (SELECT name FROM achievements a WHERE a.ach_id = user_achievements.ach_id) AS name,
+                  (SELECT reward FROM achievements a WHERE a.ach_id = user_achievements.ach_id) AS reward
+    """, (guild_id, user_id, int(time.time()), json.dumps(ach_ids))).fetchall()
+    got = {r["ach_id"]: (r["name"], int(r["reward"])) for r in rows}
+    return [got[a] for a in ach_ids if a in got]
+
+def list_user_achievements(conn: sqlite3.Connection, guild_id: int, user_id: int, limit: int = 25) -> List[sqlite3.Row]:
     return conn.execute("""
-        SELECT a.ach_id, a.name, a.description, a.reward, ua.unlocked_at
+        SELECT a.name, a.description
         FROM user_achievements ua
         JOIN achievements a ON a.ach_id = ua.ach_id
         WHERE ua.guild_id=? AND ua.user_id=?
         ORDER BY ua.unlocked_at DESC
-    """, (str(guild_id), str(user_id))).fetchall()
+        LIMIT ?
+    """, (guild_id, user_id, limit)).fetchall()
 
 # ----------------------------
 # LOANS
 # ----------------------------
 def loan_row(conn: sqlite3.Connection, guild_id: int, user_id: int) -> sqlite3.Row:
-    return conn.execute("SELECT * FROM loans WHERE guild_id=? AND user_id=?", (str(guild_id), str(user_id))).fetchone()
+    return conn.execute("SELECT * FROM loans WHERE guild_id=? AND user_id=?", (guild_id, user_id)).fetchone()
 
 def accrue_loan(conn: sqlite3.Connection, guild_id: int, user_id: int, now: int) -> None:
     row = loan_row(conn, guild_id, user_id)
@@ -625,13 +851,16 @@ def accrue_loan(conn: sqlite3.Connection, guild_id: int, user_id: int, now: int)
     if days <= 0:
         return
 
+    # interest is truncated every day, so this can't be a closed form
     rate_pct = int(row["daily_interest_pct"])
     for _ in range(days):
+        if balance * rate_pct < 100:
+            break  # interest truncates to 0 from here on
         balance += (balance * rate_pct) // 100
 
     conn.execute("""
         UPDATE loans SET balance=?, last_accrual=? WHERE guild_id=? AND user_id=?
-    """, (balance, last + days * 24 * 60 * 60, str(guild_id), str(user_id)))
+    """, (balance, last + days * 24 * 60 * 60, guild_id, user_id))
 
 def set_loan(conn: sqlite3.Connection, guild_id: int, user_id: int, principal: int, balance: int, now: int) -> None:
     conn.execute("""
@@ -644,10 +873,10 @@ def set_loan(conn: sqlite3.Connection, guild_id: int, user_id: int, principal: i
             origination_fee_pct=excluded.origination_fee_pct,
             opened_at=excluded.opened_at,
             last_accrual=excluded.last_accrual
-    """, (str(guild_id), str(user_id), principal, balance, LOAN_DAILY_INTEREST_PCT, LOAN_ORIGINATION_FEE_PCT, now, now))
+    """, (guild_id, user_id, principal, balance, LOAN_DAILY_INTEREST_PCT, LOAN_ORIGINATION_FEE_PCT, now, now))
 
 def clear_loan(conn: sqlite3.Connection, guild_id: int, user_id: int) -> None:
-    conn.execute("DELETE FROM loans WHERE guild_id=? AND user_id=?", (str(guild_id), str(user_id)))
+    conn.execute("DELETE FROM loans WHERE guild_id=? AND user_id=?", (guild_id, user_id))
 
 # ----------------------------
 # BOT SETUP
@@ -663,23 +892,90 @@ def require_guild(interaction: discord.Interaction) -> Optional[discord.Embed]:
 def is_admin_member(member: discord.Member) -> bool:
     return member.guild_permissions.administrator
 
+# Commands are registered either globally or as per-guild copies, never both: Discord
+# lists both sets, so every command would show up twice. In per-guild mode the global
+# set is moved in here once, and each guild gets copies of it.
+_guild_command_set: List[Union[app_commands.Command, app_commands.Group]] = []
+
+async def clear_global_commands() -> None:
+    # once per process; the empty global sync drops registrations left by earlier global syncs
+    if _guild_command_set:
+        return
+    _guild_command_set.extend(bot.tree.get_commands())
+    bot.tree.clear_commands(guild=None)
+    await bot.tree.sync()
+
+async def sync_guild_commands(guild: discord.Guild) -> int:
+    # guild-scoped sync is applied immediately; global sync is slow and rate-limited.
+    # In global mode this pushes an empty set, removing copies left by a per-guild run.
+    if not SYNC_GLOBAL_COMMANDS:
+        for cmd in _guild_command_set:
+            bot.tree.add_command(cmd, guild=guild, override=True)
+    synced = await bot.tree.sync(guild=guild)
+    return len(synced)
+
 @bot.event
 async def on_ready():
+    log.info("Logged in as %s", bot.user)
     try:
-        synced = await bot.tree.sync()
-        print(f"✅ Logged in as {bot.user} | Synced {len(synced)} commands")
-    except Exception as e:
-        print(f"❌ Command sync failed: {e}")
+        if SYNC_GLOBAL_COMMANDS:
+            synced = await bot.tree.sync()
+            log.info("Synced %d commands globally", len(synced))
+        else:
+            await clear_global_commands()
+        for g in bot.guilds:
+            n = await sync_guild_commands(g)
+            log.info("Synced %d commands to %s", n, g.name)
+    except Exception:
+        log.exception("Command sync failed")
 
-async def resolve_display_name(guild: discord.Guild, user_id: int) -> str:
-    m = guild.get_member(user_id)
-    if m is not None:
-        return m.display_name
+@bot.event
+async def on_guild_join(guild: discord.Guild):
+    await _db(prime_guild_settings, guild.id)
     try:
-        m = await guild.fetch_member(user_id)
-        return m.display_name
+        await sync_guild_commands(guild)
     except Exception:
-        return f"User {user_id}"
+        log.exception("Command sync failed for %s", guild.name)
+
+# (guild_id, user_id) -> (display name, expires at); only members missing from the gateway cache land here
+NAME_CACHE_TTL_SECONDS = 300
+NAME_CACHE_MAX = 4096
+_name_cache: Dict[Tuple[int, int], Tuple[str, float]] = {}
+
+async def resolve_display_names(guild: discord.Guild, user_ids: List[int]) -> Dict[int, str]:
+    now = time.monotonic()
+    names: Dict[int, str] = {}
+    missing: List[int] = []
+    for uid in user_ids:
+        m = guild.get_member(uid)
+        if m is not None:
+            names[uid] = m.display_name
+            continue
+        hit = _name_cache.get((guild.id, uid))
+        if hit is not None and hit[1] > now:
+            names[uid] = hit[0]
+        else:
+            missing.append(uid)
+
+    if missing:
+        try:
+            # one gateway request for the whole batch (needs the members intent)
+            found = await guild.query_members(user_ids=missing, limit=len(missing), cache=False)
+        except Exception:
+            # no members intent: fall back to REST, concurrently rather than one by one
+            res = await asyncio.gather(*(guild.fetch_member(uid) for uid in missing), return_exceptions=True)
+            found = [m for m in res if isinstance(m, discord.Member)]
+        if len(_name_cache) >= NAME_CACHE_MAX:
+            _name_cache.clear()
+        for m in found:
+            names[m.id] = m.display_name
+            _name_cache[(guild.id, m.id)] = (m.display_name, now + NAME_CACHE_TTL_SECONDS)
+
+    return {uid: names.get(uid, f"User {uid}") for uid in user_ids}
+
+def fmt_unlocked(newly: List[Tuple[str, int]]) -> str:
+    # list comp on purpose: str.join builds a list from a generator anyway
+    return "\n\n🏆 **Achievement unlocked:** " + ", ".join([f"{n} (+{r:,})" for n, r in newly])
 
 def _validate_bet(bet: int) -> Optional[str]:
     if bet < MIN_BET or bet > MAX_BET:
@@ -689,6 +985,11 @@ def _validate_bet(bet: int) -> Optional[str]:
 # ----------------------------
 # BASIC COMMANDS
 # ----------------------------
+def get_wallet(guild_id: int, user_id: int) -> int:
+    with db_connect() as conn:
+        row = peek_user(conn, guild_id, user_id)
+    return 0 if row is None else int(row["wallet"])
+
 @bot.tree.command(name="balance", description="Check your (or someone else's) balance.")
 @app_commands.describe(user="Optional: check someone else's balance")
 async def balance(interaction: discord.Interaction, user: Optional[discord.Member] = None):
@@ -696,9 +997,7 @@ async def balance(interaction: discord.Interaction, user: Optional[discord.Membe
     if guild_err:
         return await interaction.response.send_message(embed=guild_err, ephemeral=True)
     target = user or interaction.user
-    with db_connect() as conn:
-        row = get_user(conn, interaction.guild.id, target.id)
-        wallet = int(row["wallet"])
+    wallet = await _db(get_wallet, interaction.guild.id, target.id)
     await interaction.response.send_message(embed=discord.Embed(
         title="Balance",
         description=f"**{target.mention}** has **{wallet:,}** coins."
@@ -706,6 +1005,18 @@ async def balance(interaction: discord.Interaction, user: Optional[discord.Membe
 income = app_commands.Group(name="income", description="Collectible passive income (1% per day, capped).")
 bot.tree.add_command(income)
 
+def _do_income_status(guild_id: int, user_id: int, now: int) -> Optional[Tuple[int, int, int, int]]:
+    """Returns compute_income_due(...), or None if tracking was just started."""
+    with db_connect() as conn, tx(conn):
+        row = get_user(conn, guild_id, user_id)
+
+        # initialize clock on first use (no backpay)
+        if int(row["last_income_claim"]) <= 0:
+            set_last_income_claim(conn, guild_id, user_id, now)
+            return None
+
+        return compute_income_due(conn, guild_id, user_id, now)
+
 @income.command(name="status", description="See how much passive income you can claim.")
 async def income_status(interaction: discord.Interaction):
     guild_err = require_guild(interaction)
@@ -713,29 +1024,21 @@ async def income_status(interaction: discord.Interaction):
         return await interaction.response.send_message(embed=guild_err, ephemeral=True)
 
     now = int(time.time())
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
-
-        # initialize clock on first use (no backpay)
-        if int(row["last_income_claim"]) <= 0:
-            set_last_income_claim(conn, interaction.guild.id, interaction.user.id, now)
-            conn.commit()
-            return await interaction.response.send_message(
-                embed=discord.Embed(
-                    title="Income Status",
-                    description=(
-                        "Income tracking started ✅\n"
-                        "Come back after **24 hours** to claim your first payout.\n\n"
-                        f"Rate: **{INCOME_DAILY_PCT}%/day** | Daily cap: **{INCOME_DAILY_CAP:,}**"
-                    )
-                ),
-                ephemeral=True
-            )
-
-        days, total_value, daily_capped, due = compute_income_due(conn, interaction.guild.id, interaction.user.id, now)
-        conn.commit()
+    due_info = await _db(_do_income_status, interaction.guild.id, interaction.user.id, now)
+    if due_info is None:
+        return await interaction.response.send_message(
+            embed=discord.Embed(
+                title="Income Status",
+                description=(
+                    "Income tracking started ✅\n"
+                    "Come back after **24 hours** to claim your first payout.\n\n"
+                    f"Rate: **{INCOME_DAILY_PCT}%/day** | Daily cap: **{INCOME_DAILY_CAP:,}**"
+                )
+            ),
+            ephemeral=True
+        )
 
+    days, total_value, daily_capped, due = due_info
     raw_daily = (total_value * INCOME_DAILY_PCT) // 100
     desc = (
         f"Portfolio value: **{total_value:,}**\n"
@@ -746,95 +1049,98 @@ async def income_status(interaction: discord.Interaction):
     )
     await interaction.response.send_message(embed=discord.Embed(title="Income Status", description=desc), ephemeral=True)
 
-@income.command(name="claim", description="Claim your collectible passive income.")
-async def income_claim(interaction: discord.Interaction):
-    guild_err = require_guild(interaction)
-    if guild_err:
-        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
-
-    now = int(time.time())
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
+@dataclass
+class IncomeClaimResult:
+    started: bool = False       # tracking just started, nothing to pay
+    remaining: int = 0          # seconds until next accrual (when nothing is due)
+    days: int = 0
+    daily_capped: int = 0
+    due: int = 0
+    new_wallet: int = 0
+
+def _do_income_claim(guild_id: int, user_id: int, now: int) -> IncomeClaimResult:
+    with db_connect() as conn, tx(conn):
+        row = get_user(conn, guild_id, user_id)
+        last = int(row["last_income_claim"])
 
         # initialize clock on first claim attempt (no backpay)
-        if int(row["last_income_claim"]) <= 0:
-            set_last_income_claim(conn, interaction.guild.id, interaction.user.id, now)
-            conn.commit()
-            return await interaction.response.send_message(
-                embed=discord.Embed(
-                    title="Income Claim",
-                    description="Income tracking started ✅\nClaim again after **24 hours**."
-                ),
-                ephemeral=True
-            )
+        if last <= 0:
+            set_last_income_claim(conn, guild_id, user_id, now)
+            return IncomeClaimResult(started=True)
 
-        days, total_value, daily_capped, due = compute_income_due(conn, interaction.guild.id, interaction.user.id, now)
+        days, _total_value, daily_capped, due = compute_income_due(conn, guild_id, user_id, now)
 
         if due <= 0:
-            last = int(row["last_income_claim"])
-            remaining = INCOME_DAY_SECONDS - ((now - last) % INCOME_DAY_SECONDS)
-            hrs = remaining // 3600
-            mins = (remaining % 3600) // 60
-            secs = remaining % 60
             conn.rollback()
-            return await interaction.response.send_message(
-                embed=discord.Embed(
-                    title="Income Claim",
-                    description=f"Nothing to claim yet. Next accrual in **{hrs}h {mins}m {secs}s**."
-                ),
-                ephemeral=True
-            )
+            return IncomeClaimResult(remaining=INCOME_DAY_SECONDS - ((now - last) % INCOME_DAY_SECONDS))
 
-        new_wallet = update_wallet(conn, interaction.guild.id, interaction.user.id, due)
+        new_wallet = update_wallet(conn, guild_id, user_id, due)
 
         # move timestamp forward by whole days to prevent double-claim
-        last = int(row["last_income_claim"])
-        new_last = last + (days * INCOME_DAY_SECONDS)
-        set_last_income_claim(conn, interaction.guild.id, interaction.user.id, new_last)
+        set_last_income_claim(conn, guild_id, user_id, last + (days * INCOME_DAY_SECONDS))
+
+    return IncomeClaimResult(days=days, daily_capped=daily_capped, due=due, new_wallet=new_wallet)
+
+@income.command(name="claim", description="Claim your collectible passive income.")
+async def income_claim(interaction: discord.Interaction):
+    guild_err = require_guild(interaction)
+    if guild_err:
+        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
+
+    now = int(time.time())
+    res = await _db(_do_income_claim, interaction.guild.id, interaction.user.id, now)
+
+    if res.started:
+        return await interaction.response.send_message(
+            embed=discord.Embed(
+                title="Income Claim",
+                description="Income tracking started ✅\nClaim again after **24 hours**."
+            ),
+            ephemeral=True
+        )
 
-        conn.commit()
+    if res.due <= 0:
+        m, secs = divmod(res.remaining, 60)
+        hrs, mins = divmod(m, 60)
+        return await interaction.response.send_message(
+            embed=discord.Embed(
+                title="Income Claim",
+                description=f"Nothing to claim yet. Next accrual in **{hrs}h {mins}m {secs}s**."
+            ),
+            ephemeral=True
+        )
 
     desc = (
-        f"Claimed: **{due:,}** coins\n"
-        f"Days claimed: **{days}**\n"
-        f"Daily (capped): **{daily_capped:,}** / day\n"
+        f"Claimed: **{res.due:,}** coins\n"
+        f"Days claimed: **{res.days}**\n"
+        f"Daily (capped): **{res.daily_capped:,}** / day\n"
         f"Daily cap: **{INCOME_DAILY_CAP:,}**\n\n"
-        f"New balance: **{new_wallet:,}**"
+        f"New balance: **{res.new_wallet:,}**"
     )
     await interaction.response.send_message(embed=discord.Embed(title="Income Claimed", description=desc))
 
 # ----------------------------
 # /DAILY (streaks + bonuses)
 # ----------------------------
-@bot.tree.command(name="daily", description="Claim your daily coins (streaks + bonuses).")
-async def daily(interaction: discord.Interaction):
-    guild_err = require_guild(interaction)
-    if guild_err:
-        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
-
-    now = int(time.time())
-
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
+@dataclass
+class DailyResult:
+    remaining: int = 0          # > 0 means still on cooldown
+    new_streak: int = 0
+    bonus: int = 0
+    payout: int = 0
+    new_wallet: int = 0
+    newly: List[Tuple[str, int]] = field(default_factory=list)
+
+def _do_daily(guild_id: int, user_id: int, now: int) -> DailyResult:
+    with db_connect() as conn, tx(conn):
+        row = get_user(conn, guild_id, user_id)
 
         last = int(row["last_daily"])
         streak = int(row["daily_streak"])
 
         if last > 0 and (now - last) < DAILY_COOLDOWN_SECONDS:
-            remaining = DAILY_COOLDOWN_SECONDS - (now - last)
-            hrs = remaining // 3600
-            mins = (remaining % 3600) // 60
-            secs = remaining % 60
             conn.rollback()
-            return await interaction.response.send_message(
-                embed=discord.Embed(
-                    title="Daily",
-                    description=f"You're still on cooldown. Try again in **{hrs}h {mins}m {secs}s**."
-                ),
-                ephemeral=True
-            )
+            return DailyResult(remaining=DAILY_COOLDOWN_SECONDS - (now - last))
 
         if last <= 0:
             new_streak = 1
@@ -845,37 +1151,56 @@ async def daily(interaction: discord.Interaction):
             else:
                 new_streak = 1
 
-        bonus = STREAK_BONUS.get(new_streak, 0)
+        bonus = _STREAK_BONUS_ARR[new_streak] if new_streak < len(_STREAK_BONUS_ARR) else 0
         payout = DAILY_AMOUNT + bonus
 
-        set_last_daily(conn, interaction.guild.id, interaction.user.id, now)
-        set_daily_streak(conn, interaction.guild.id, interaction.user.id, new_streak)
-        new_wallet = update_wallet(conn, interaction.guild.id, interaction.user.id, payout)
-
         newly = []
-        if achievements_enabled(conn, interaction.guild.id):
-            r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "first_daily")
-            if r is not None:
-                update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                newly.append(("First Daily", r))
+        if achievements_enabled(conn, guild_id):
+            candidates = ["first_daily"]
             if new_streak >= 7:
-                r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "streak_7")
-                if r is not None:
-                    update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                    newly.append(("7-Day Streak", r))
+                candidates.append("streak_7")
+            newly = unlock_achievements(conn, guild_id, user_id, candidates)
 
-        conn.commit()
+        # claim bookkeeping + payout + achievement rewards in one statement
+        mark_lb_dirty(guild_id, "wallet")
+        new_wallet = int(conn.execute("""
+            UPDATE guild_users SET wallet = wallet + ?, last_daily = ?, daily_streak = ?
+            WHERE guild_id=? AND user_id=?
+            RETURNING wallet
+        """, (payout + sum(r for _, r in newly), now, new_streak, guild_id, user_id)).fetchone()["wallet"])
+
+    return DailyResult(new_streak=new_streak, bonus=bonus, payout=payout, new_wallet=new_wallet, newly=newly)
+
+@bot.tree.command(name="daily", description="Claim your daily coins (streaks + bonuses).")
+async def daily(interaction: discord.Interaction):
+    guild_err = require_guild(interaction)
+    if guild_err:
+        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
+
+    now = int(time.time())
+    res = await _db(_do_daily, interaction.guild.id, interaction.user.id, now)
+
+    if res.remaining > 0:
+        m, secs = divmod(res.remaining, 60)
+        hrs, mins = divmod(m, 60)
+        return await interaction.response.send_message(
+            embed=discord.Embed(
+                title="Daily",
+                description=f"You're still on cooldown. Try again in **{hrs}h {mins}m {secs}s**."
+            ),
+            ephemeral=True
+        )
 
     desc = (
         f"You claimed **{DAILY_AMOUNT:,}** coins.\n"
-        f"Streak: **{new_streak}** day(s)\n"
+        f"Streak: **{res.new_streak}** day(s)\n"
     )
-    if bonus:
-        desc += f"Streak bonus: **+{bonus:,}**\n"
-    desc += f"\nTotal: **+{payout:,}**\nBalance: **{new_wallet:,}**"
+    if res.bonus:
+        desc += f"Streak bonus: **+{res.bonus:,}**\n"
+    desc += f"\nTotal: **+{res.payout:,}**\nBalance: **{res.new_wallet:,}**"
 
-    if newly:
-        desc += "\n\n🏆 **Achievement unlocked:** " + ", ".join([f"{n} (+{r:,})" for n, r in newly])
+    if res.newly:
+        desc += fmt_unlocked(res.newly)
 
     await interaction.response.send_message(embed=discord.Embed(title="Daily", description=desc))
 
@@ -886,57 +1211,72 @@ BEG_COOLDOWN_SECONDS = 60 * 60  # 1 hour
 BEG_MIN_WALLET_ALLOWED = 10     # must be strictly less than this
 BEG_PAYOUT = 50
 
-@bot.tree.command(name="beg", description="Beg for coins (only if you have <10 coins). 1 hour cooldown.")
-async def beg(interaction: discord.Interaction):
-    guild_err = require_guild(interaction)
-    if guild_err:
-        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
+_BEG_GREEDY_TMPL = (
+    "**HAHA!** You're **super greedy**.\n"
+    "\"I only have so many coins to give, be more grateful goy and do better in the games.\" \n\n"
+    "Try again in **{m}m {s}s**."
+)
 
-    now = int(time.time())
+@dataclass
+class BegResult:
+    too_rich: bool = False
+    remaining: int = 0          # > 0 means still on cooldown
+    new_wallet: int = 0
 
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
+def _do_beg(guild_id: int, user_id: int, now: int) -> BegResult:
+    with db_connect() as conn, tx(conn):
+        row = get_user(conn, guild_id, user_id)
 
         wallet = int(row["wallet"])
         last = int(row["last_beg"])
 
         if wallet >= BEG_MIN_WALLET_ALLOWED:
             conn.rollback()
-            return await interaction.response.send_message(
-                embed=discord.Embed(
-                    title="Beg",
-                    description="You have enough, play for more coins you little goy."
-                ),
-                ephemeral=True
-            )
+            return BegResult(too_rich=True)
 
         remaining = BEG_COOLDOWN_SECONDS - (now - last)
         if remaining > 0:
-            mins = remaining // 60
-            secs = remaining % 60
             conn.rollback()
-            return await interaction.response.send_message(
-                embed=discord.Embed(
-                    title="Beg",
-                    description=(
-                        f"**HAHA!** You're **super greedy**.\n"
-                        f"\"I only have so many coins to give, be more grateful goy and do better in the games.\" \n\n"
-                        f"Try again in **{mins}m {secs}s**."
-                    )
-                ),
-                ephemeral=True
-            )
+            return BegResult(remaining=remaining)
+
+        mark_lb_dirty(guild_id, "wallet")
+        new_wallet = int(conn.execute("""
+            UPDATE guild_users SET wallet = wallet + ?, last_beg = ?, beg_bonus_ready = 0
+            WHERE guild_id=? AND user_id=?
+            RETURNING wallet
+        """, (BEG_PAYOUT, now, guild_id, user_id)).fetchone()["wallet"])
 
-        set_last_beg(conn, interaction.guild.id, interaction.user.id, now)
-        new_wallet = update_wallet(conn, interaction.guild.id, interaction.user.id, BEG_PAYOUT)
-        set_beg_bonus_ready(conn, interaction.guild.id, interaction.user.id, False)
-        conn.commit()
+    return BegResult(new_wallet=new_wallet)
+
+@bot.tree.command(name="beg", description="Beg for coins (only if you have <10 coins). 1 hour cooldown.")
+async def beg(interaction: discord.Interaction):
+    guild_err = require_guild(interaction)
+    if guild_err:
+        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
+
+    now = int(time.time())
+    res = await _db(_do_beg, interaction.guild.id, interaction.user.id, now)
+
+    if res.too_rich:
+        return await interaction.response.send_message(
+            embed=discord.Embed(
+                title="Beg",
+                description="You have enough, play for more coins you little goy."
+            ),
+            ephemeral=True
+        )
+
+    if res.remaining > 0:
+        mins, secs = divmod(res.remaining, 60)
+        return await interaction.response.send_message(
+            embed=discord.Embed(title="Beg", description=_BEG_GREEDY_TMPL.format(m=mins, s=secs)),
+            ephemeral=True
+        )
 
     await interaction.response.send_message(
         embed=discord.Embed(
             title="Beg",
-            description=f"Yes, grovel for coins you little goy\n\nYou received **{BEG_PAYOUT:,}** coins.\nBalance: **{new_wallet:,}**"
+            description=f"Yes, grovel for coins you little goy\n\nYou received **{BEG_PAYOUT:,}** coins.\nBalance: **{res.new_wallet:,}**"
         )
     )
 
@@ -946,74 +1286,93 @@ async def beg(interaction: discord.Interaction):
 roulette = app_commands.Group(name="roulette", description="American roulette (0 and 00). Bet color or a number.")
 bot.tree.add_command(roulette)
 
-color_choices = [
-    app_commands.Choice(name="red", value="red"),
-    app_commands.Choice(name="black", value="black"),
-]
-
-@roulette.command(name="color", description="Bet on red or black.")
-@app_commands.describe(bet="How many coins to bet", color="Pick red or black")
-@app_commands.choices(color=color_choices)
-async def roulette_color(interaction: discord.Interaction, bet: int, color: app_commands.Choice[str]):
-    guild_err = require_guild(interaction)
-    if guild_err:
-        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
-    msg = _validate_bet(bet)
-    if msg:
-        return await interaction.response.send_message(embed=discord.Embed(title="Invalid bet", description=msg), ephemeral=True)
-
-    choice = color.value
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
-        wallet = int(row["wallet"])
+@dataclass
+class SpinResult:
+    wallet: int = 0             # balance before the bet
+    short: bool = False         # bet > wallet; nothing was written
+    fee: int = 0
+    net: int = 0
+    new_wallet: int = 0
+    newly: List[Tuple[str, int]] = field(default_factory=list)
+
+def _do_roulette(guild_id: int, user_id: int, bet: int, payout: int) -> SpinResult:
+    with db_connect() as conn, tx(conn):
+        wallet = int(get_user(conn, guild_id, user_id)["wallet"])
         if bet > wallet:
             conn.rollback()
-            return await interaction.response.send_message(
-                embed=discord.Embed(title="Not enough coins", description=f"You have **{wallet:,}** coins."),
-                ephemeral=True
-            )
+            return SpinResult(wallet=wallet, short=True)
 
-        update_wallet(conn, interaction.guild.id, interaction.user.id, -bet)
+        fee = loss_fee(bet) if payout == 0 else 0
+        net = payout - bet - fee
+        apply_roulette_stats(conn, guild_id, user_id, bet, net)
 
-        roll: Pocket = random.choice(POCKETS)
-        rolled_color = pocket_color(roll)
+        newly = []
+        if achievements_enabled(conn, guild_id) and net >= 10_000:
+            hit = unlock_achievement(conn, guild_id, user_id, "roulette_big")
+            if hit is not None:
+                newly.append(hit)
 
-        payout = bet * COLOR_RETURN_MULT if rolled_color == choice else 0
-        fee = 0
-        if payout == 0:
-            fee = loss_fee(bet)
-            if fee:
-                update_wallet(conn, interaction.guild.id, interaction.user.id, -fee)
+        # bet, fee, payout and rewards settle as one wallet write
+        new_wallet = update_wallet(conn, guild_id, user_id, net + sum(r for _, r in newly))
 
-        new_wallet = update_wallet(conn, interaction.guild.id, interaction.user.id, payout) if payout else int(get_user(conn, interaction.guild.id, interaction.user.id)["wallet"])
-        net = payout - bet - fee
-        apply_roulette_stats(conn, interaction.guild.id, interaction.user.id, bet, net)
+    return SpinResult(wallet=wallet, fee=fee, net=net, new_wallet=new_wallet, newly=newly)
 
-        newly = []
-        if achievements_enabled(conn, interaction.guild.id) and net >= 10_000:
-            r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "roulette_big")
-            if r is not None:
-                update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                newly.append(("Big Spin", r))
-        conn.commit()
+async def _spin_and_resolve(
+    interaction: discord.Interaction,
+    bet: int,
+    bet_label: str,
+    title: str,
+    mult: Union[int, float],
+    win_pred: Callable[[Pocket], bool],
+):
+    # shared tail of /roulette color and /roulette number once the bet is validated
+    roll: Pocket = _rng.choice(_POCKETS_TUPLE)
+    rolled_color = _POCKET_COLOR[roll]
+    payout = bet * mult if win_pred(roll) else 0
+
+    res = await _db(_do_roulette, interaction.guild.id, interaction.user.id, bet, payout)
+    if res.short:
+        return await interaction.response.send_message(
+            embed=discord.Embed(title="Not enough coins", description=f"You have **{res.wallet:,}** coins."),
+            ephemeral=True
+        )
+    fee, net, new_wallet, newly = res.fee, res.net, res.new_wallet, res.newly
 
     net_text = f"+{net:,}" if net >= 0 else f"{net:,}"
     desc = (
-        f"You bet **{bet:,}** on **{choice}**.\n"
+        f"You bet **{bet:,}** on **{bet_label}**.\n"
         f"Wheel: **{fmt_pocket(roll)} ({rolled_color})**\n"
     )
     if fee:
         desc += f"Loss fee: **-{fee:,}**\n"
     desc += f"\nNet: **{net_text}** coins\nNew balance: **{new_wallet:,}** coins"
     if newly:
-        desc += "\n\n🏆 **Achievement unlocked:** " + ", ".join([f"{n} (+{r:,})" for n, r in newly])
+        desc += fmt_unlocked(newly)
 
-    await interaction.response.send_message(embed=discord.Embed(title="Roulette (Color)", description=desc))
+    await interaction.response.send_message(embed=discord.Embed(title=title, description=desc))
 
-@roulette.command(name="number", description="Bet a specific pocket (0, 00, or 1-36).")
-@app_commands.describe(bet="How many coins to bet", pocket="Choose 0, 00, or 1-36 (type 00 for double zero)")
-async def roulette_number(interaction: discord.Interaction, bet: int, pocket: str):
+color_choices = [
+    app_commands.Choice(name="red", value="red"),
+    app_commands.Choice(name="black", value="black"),
+]
+
+@roulette.command(name="color", description="Bet on red or black.")
+@app_commands.describe(bet="How many coins to bet", color="Pick red or black")
+@app_commands.choices(color=color_choices)
+async def roulette_color(interaction: discord.Interaction, bet: int, color: app_commands.Choice[str]):
+    guild_err = require_guild(interaction)
+    if guild_err:
+        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
+    msg = _validate_bet(bet)
+    if msg:
+        return await interaction.response.send_message(embed=discord.Embed(title="Invalid bet", description=msg), ephemeral=True)
+
+    choice = color.value
+    await _spin_and_resolve(interaction, bet, choice, "Roulette (Color)", COLOR_RETURN_MULT, lambda roll: _POCKET_COLOR[roll] == choice)
+
+@roulette.command(name="number", description="Bet a specific pocket (0, 00, or 1-36).")
+@app_commands.describe(bet="How many coins to bet", pocket="Choose 0, 00, or 1-36 (type 00 for double zero)")
+async def roulette_number(interaction: discord.Interaction, bet: int, pocket: str):
     guild_err = require_guild(interaction)
     if guild_err:
         return await interaction.response.send_message(embed=guild_err, ephemeral=True)
@@ -1040,59 +1399,14 @@ async def roulette_number(interaction: discord.Interaction, bet: int, pocket: st
             )
         chosen = n
 
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
-        wallet = int(row["wallet"])
-        if bet > wallet:
-            conn.rollback()
-            return await interaction.response.send_message(
-                embed=discord.Embed(title="Not enough coins", description=f"You have **{wallet:,}** coins."),
-                ephemeral=True
-            )
-
-        update_wallet(conn, interaction.guild.id, interaction.user.id, -bet)
-
-        roll: Pocket = random.choice(POCKETS)
-        rolled_color = pocket_color(roll)
-
-        payout = bet * STRAIGHT_UP_RETURN_MULT if roll == chosen else 0
-        fee = 0
-        if payout == 0:
-            fee = loss_fee(bet)
-            if fee:
-                update_wallet(conn, interaction.guild.id, interaction.user.id, -fee)
-
-        new_wallet = update_wallet(conn, interaction.guild.id, interaction.user.id, payout) if payout else int(get_user(conn, interaction.guild.id, interaction.user.id)["wallet"])
-        net = payout - bet - fee
-        apply_roulette_stats(conn, interaction.guild.id, interaction.user.id, bet, net)
-
-        newly = []
-        if achievements_enabled(conn, interaction.guild.id) and net >= 10_000:
-            r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "roulette_big")
-            if r is not None:
-                update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                newly.append(("Big Spin", r))
-        conn.commit()
-
-    net_text = f"+{net:,}" if net >= 0 else f"{net:,}"
-    desc = (
-        f"You bet **{bet:,}** on **{fmt_pocket(chosen)}**.\n"
-        f"Wheel: **{fmt_pocket(roll)} ({rolled_color})**\n"
-    )
-    if fee:
-        desc += f"Loss fee: **-{fee:,}**\n"
-    desc += f"\nNet: **{net_text}** coins\nNew balance: **{new_wallet:,}** coins"
-    if newly:
-        desc += "\n\n🏆 **Achievement unlocked:** " + ", ".join([f"{n} (+{r:,})" for n, r in newly])
-
-    await interaction.response.send_message(embed=discord.Embed(title="Roulette (Number)", description=desc))
+    await _spin_and_resolve(interaction, bet, fmt_pocket(chosen), "Roulette (Number)", STRAIGHT_UP_RETURN_MULT, lambda roll: roll == chosen)
 
 # ----------------------------
 # SLOTS (3-reel, weighted, payout table)
 # ----------------------------
 SLOTS_SYMBOLS = ["🍒", "🍋", "🍇", "🔔", "💎", "👑"]
 SLOTS_WEIGHTS = [40, 30, 18, 8, 3, 1]  # totals to 100
+SLOTS_CUM = list(itertools.accumulate(SLOTS_WEIGHTS))
 
 SLOTS_PAYOUT = {
     "🍒": 20,
@@ -1104,7 +1418,29 @@ SLOTS_PAYOUT = {
 }
 
 def slots_spin() -> List[str]:
-    return random.choices(SLOTS_SYMBOLS, weights=SLOTS_WEIGHTS, k=3)
+    return _rng.choices(SLOTS_SYMBOLS, cum_weights=SLOTS_CUM, k=3)
+
+def _do_slots(guild_id: int, user_id: int, bet: int, payout: int, jackpot: bool) -> SpinResult:
+    with db_connect() as conn, tx(conn):
+        wallet = int(get_user(conn, guild_id, user_id)["wallet"])
+        if bet > wallet:
+            conn.rollback()
+            return SpinResult(wallet=wallet, short=True)
+
+        net = payout - bet
+
+        apply_slots_stats(conn, guild_id, user_id, bet, net)
+
+        newly = []
+        if achievements_enabled(conn, guild_id):
+            if jackpot:
+                hit = unlock_achievement(conn, guild_id, user_id, "slots_jackpot")
+                if hit is not None:
+                    newly.append(hit)
+
+        new_wallet = update_wallet(conn, guild_id, user_id, net + sum(r for _, r in newly))
+
+    return SpinResult(wallet=wallet, net=net, new_wallet=new_wallet, newly=newly)
 
 @bot.tree.command(name="slots", description="Spin slots (3 reels). Match 3 to win.")
 @app_commands.describe(bet="How many coins to bet")
@@ -1119,43 +1455,23 @@ async def slots(interaction: discord.Interaction, bet: int):
             ephemeral=True
         )
 
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
-        wallet = int(row["wallet"])
-        if bet > wallet:
-            conn.rollback()
-            return await interaction.response.send_message(
-                embed=discord.Embed(title="Not enough coins", description=f"You have **{wallet:,}** coins."),
-                ephemeral=True
-            )
-
-        update_wallet(conn, interaction.guild.id, interaction.user.id, -bet)
-
-        reels = slots_spin()
-        payout = 0
-        jackpot = False
+    reels = slots_spin()
+    payout = 0
+    jackpot = False
 
-        if reels[0] == reels[1] == reels[2]:
-            sym = reels[0]
-            mult = SLOTS_PAYOUT.get(sym, 0)
-            payout = bet * mult
-            jackpot = (sym == "👑")
-
-        new_wallet = update_wallet(conn, interaction.guild.id, interaction.user.id, payout) if payout else int(get_user(conn, interaction.guild.id, interaction.user.id)["wallet"])
-        net = payout - bet
-
-        apply_slots_stats(conn, interaction.guild.id, interaction.user.id, bet, net)
-
-        newly = []
-        if achievements_enabled(conn, interaction.guild.id):
-            if jackpot:
-                r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "slots_jackpot")
-                if r is not None:
-                    update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                    newly.append(("Jackpot", r))
+    if reels[0] == reels[1] == reels[2]:
+        sym = reels[0]
+        mult = SLOTS_PAYOUT.get(sym, 0)
+        payout = bet * mult
+        jackpot = (sym == "👑")
 
-        conn.commit()
+    res = await _db(_do_slots, interaction.guild.id, interaction.user.id, bet, payout, jackpot)
+    if res.short:
+        return await interaction.response.send_message(
+            embed=discord.Embed(title="Not enough coins", description=f"You have **{res.wallet:,}** coins."),
+            ephemeral=True
+        )
+    net, new_wallet, newly = res.net, res.new_wallet, res.newly
 
     net_text = f"+{net:,}" if net >= 0 else f"{net:,}"
     line = " | ".join(reels)
@@ -1163,7 +1479,7 @@ async def slots(interaction: discord.Interaction, bet: int):
     if payout:
         desc += f"\nPayout: **{payout:,}**"
     if newly:
-        desc += "\n\n🏆 **Achievement unlocked:** " + ", ".join([f"{n} (+{r:,})" for n, r in newly])
+        desc += fmt_unlocked(newly)
 
     await interaction.response.send_message(embed=discord.Embed(title="Slots", description=desc))
 
@@ -1179,14 +1495,6 @@ async def slots(interaction: discord.Interaction, bet: int):
 SUITS = ["♠", "♥", "♦", "♣"]
 RANKS = ["A"] + [str(i) for i in range(2, 11)] + ["J", "Q", "K"]
 
-def new_deck() -> List[str]:
-    deck = [f"{r}{s}" for s in SUITS for r in RANKS]
-    random.shuffle(deck)
-    return deck
-
-def draw_card(deck: List[str]) -> str:
-    return deck.pop()
-
 def card_value(rank: str) -> int:
     if rank in ("J", "Q", "K"):
         return 10
@@ -1194,48 +1502,87 @@ def card_value(rank: str) -> int:
         return 11
     return int(rank)
 
-def hand_value(cards: List[str]) -> int:
-    ranks = [c[:-1] for c in cards]
-    total = sum(card_value(r) for r in ranks)
-    aces = sum(1 for r in ranks if r == "A")
-    while total > 21 and aces > 0:
-        total -= 10
-        aces -= 1
-    return total
-
-def is_soft(cards: List[str]) -> bool:
-    ranks = [c[:-1] for c in cards]
-    if "A" not in ranks:
-        return False
-    # all-aces-as-1 total:
-    min_total = sum(1 if r == "A" else (10 if r in ("J", "Q", "K") else int(r)) for r in ranks)
-    # if one ace can be 11 without busting, it's soft
-    return (min_total + 10) <= 21
-
-def is_natural_blackjack(cards: List[str]) -> bool:
+# Cards (blackjack and hold'em) are one byte each: rank index (RANKS order, so aces are 0..3) * 4 + suit index.
+# Decks are bytearrays; strings only exist at render time.
+CARD_STR: List[str] = [f"{RANKS[c >> 2]}{SUITS[c & 3]}" for c in range(52)]
+CARD_HARD: List[int] = [1 if c < 4 else card_value(RANKS[c >> 2]) for c in range(52)]  # aces as 1
+_DECK_ORDER = bytes(r * 4 + s for s in range(4) for r in range(13))  # suit-major, like the old string decks
+
+def new_deck() -> bytearray:
+    deck = bytearray(_DECK_ORDER)
+    _rng.shuffle(deck)
+    return deck
+
+def best_total(hard: int, aces: int) -> int:
+    # at most one ace can ever count as 11
+    return hard + 10 if aces and hard + 10 <= 21 else hard
+
+def hand_value(cards: List[int]) -> int:
+    return best_total(sum(CARD_HARD[c] for c in cards), sum(1 for c in cards if c < 4))
+
+def is_soft(cards: List[int]) -> bool:
+    # soft = an ace can be 11 without busting
+    return any(c < 4 for c in cards) and sum(CARD_HARD[c] for c in cards) + 10 <= 21
+
+def is_natural_blackjack(cards: List[int]) -> bool:
     return len(cards) == 2 and hand_value(cards) == 21
 
 def frac_mult(amount: int, num: int, den: int) -> int:
     return (amount * num) // den
 
-@dataclass
+@dataclass(slots=True)
 class BJGame:
     bet: int
-    deck: List[str]
-    player: List[str]
-    dealer: List[str]
-    done: bool = False
+    deck: bytearray
+    player: List[int]
+    dealer: List[int]
     doubled: bool = False
-
-BJ_GAMES: Dict[Tuple[int, int], BJGame] = {}  # (guild_id, user_id) -> game
-BJ_LOCKS: Dict[Tuple[int, int], asyncio.Lock] = {}
-
-def _bj_lock(key: Tuple[int, int]) -> asyncio.Lock:
+    # running (aces-as-1 total, ace count) per hand; use deal_player/deal_dealer so they stay in step
+    player_hard: int = 0
+    player_aces: int = 0
+    dealer_hard: int = 0
+    dealer_aces: int = 0
+
+    def __post_init__(self) -> None:
+        self.player_hard = sum(CARD_HARD[c] for c in self.player)
+        self.player_aces = sum(1 for c in self.player if c < 4)
+        self.dealer_hard = sum(CARD_HARD[c] for c in self.dealer)
+        self.dealer_aces = sum(1 for c in self.dealer if c < 4)
+
+    def deal_player(self) -> None:
+        card = self.deck.pop()
+        self.player.append(card)
+        self.player_hard += CARD_HARD[card]
+        self.player_aces += card < 4
+
+    def deal_dealer(self) -> None:
+        card = self.deck.pop()
+        self.dealer.append(card)
+        self.dealer_hard += CARD_HARD[card]
+        self.dealer_aces += card < 4
+
+    @property
+    def player_value(self) -> int:
+        return best_total(self.player_hard, self.player_aces)
+
+    @property
+    def dealer_value(self) -> int:
+        return best_total(self.dealer_hard, self.dealer_aces)
+
+    @property
+    def dealer_soft(self) -> bool:
+        return self.dealer_aces > 0 and self.dealer_hard + 10 <= 21
+
+BJ_GAMES: Dict[int, BJGame] = {}  # _bj_key(guild_id, user_id) -> game; a game is live exactly while it is in here
+BJ_LOCKS: Dict[int, asyncio.Lock] = {}
+
+def _bj_key(guild_id: int, user_id: int) -> int:
+    # snowflakes are < 2**64, so this packs both ids into one int without a tuple
+    return (guild_id << 64) | user_id
+
+def _bj_lock(key: int) -> asyncio.Lock:
     lock = BJ_LOCKS.get(key)
-    if lock is None:
-        lock = asyncio.Lock()
-        BJ_LOCKS[key] = lock
-    return lock
+    return lock if lock is not None else BJ_LOCKS.setdefault(key, asyncio.Lock())
 
 async def _bj_defer_update(interaction: discord.Interaction):
     # Always ACK fast to avoid "Interaction Failed"
@@ -1261,6 +1608,34 @@ async def _bj_edit(interaction: discord.Interaction, *, embed=None, view=None, c
             return await interaction.response.edit_message(content=content, embed=embed, view=view)
         raise
 
+def _do_stake(guild_id: int, user_id: int, amount: int) -> Tuple[bool, int]:
+    # blackjack deal / hold'em ante: take the stake if the wallet covers it -> (charged, wallet before)
+    with db_connect() as conn:
+        row = conn.execute(_SQL_TRY_WALLET_DELTA, (-amount, guild_id, user_id, -amount, -amount)).fetchone()
+        if row is not None:
+            mark_lb_dirty(guild_id, "wallet")
+            return True, int(row["wallet"]) + amount
+        # short (or no row yet): only now read the balance for the reply
+        return False, int(get_user(conn, guild_id, user_id)["wallet"])
+
+def _do_bj_finish(guild_id: int, user_id: int, game: "BJGame", outcome: str, payout: int, net: int) -> Tuple[int, List[Tuple[str, int]]]:
+    with db_connect() as conn, tx(conn):
+        apply_blackjack_stats(conn, guild_id, user_id, game.bet, net, outcome)
+
+        newly = []
+        if achievements_enabled(conn, guild_id):
+            candidates = []
+            if is_natural_blackjack(game.player):
+                candidates.append("bj_blackjack")
+            if game.doubled and outcome == "win":
+                candidates.append("bj_double")
+            newly = unlock_achievements(conn, guild_id, user_id, candidates)
+
+        # both stakes were taken up front (deal, double); the payout and any rewards land in one write
+        new_wallet = update_wallet(conn, guild_id, user_id, payout + sum(r for _, r in newly))
+
+    return new_wallet, newly
+
 class BlackjackView(discord.ui.View):
     def __init__(self, guild_id: int, user_id: int, timeout: float = 90.0):
         super().__init__(timeout=timeout)
@@ -1274,18 +1649,19 @@ class BlackjackView(discord.ui.View):
         return True
 
     async def on_timeout(self) -> None:
-        key = (self.guild_id, self.user_id)
+        # _finish stops the view, so this only fires for abandoned games
+        key = _bj_key(self.guild_id, self.user_id)
         BJ_GAMES.pop(key, None)
         BJ_LOCKS.pop(key, None)
 
     def _render(self, game: BJGame, reveal_dealer: bool) -> discord.Embed:
-        pv = hand_value(game.player)
-        dv = hand_value(game.dealer)
-        dealer_cards = game.dealer if reveal_dealer else [game.dealer[0], "??"]
+        pv = game.player_value
+        dv = game.dealer_value
+        dealer_cards = " ".join(CARD_STR[c] for c in game.dealer) if reveal_dealer else f"{CARD_STR[game.dealer[0]]} ??"
         dealer_val = dv if reveal_dealer else "?"
         embed = discord.Embed(title="Blackjack")
-        embed.add_field(name="Your Hand", value=f"{' '.join(game.player)}  (**{pv}**)", inline=False)
-        embed.add_field(name="Dealer", value=f"{' '.join(dealer_cards)}  (**{dealer_val}**)", inline=False)
+        embed.add_field(name="Your Hand", value=f"{' '.join(CARD_STR[c] for c in game.player)}  (**{pv}**)", inline=False)
+        embed.add_field(name="Dealer", value=f"{dealer_cards}  (**{dealer_val}**)", inline=False)
         extra = " | DOUBLED" if game.doubled else ""
         embed.set_footer(text=f"Bet: {game.bet:,} coins{extra}")
         return embed
@@ -1303,7 +1679,8 @@ class BlackjackView(discord.ui.View):
         # Ensure ACK already happened (buttons), so edits won't "fail"
         await _bj_defer_update(interaction)
 
-        key = (interaction.guild.id, interaction.user.id)
+        gid, uid = interaction.guild.id, interaction.user.id
+        key = _bj_key(gid, uid)
         lock = _bj_lock(key)
 
         # Compute + DB inside lock to keep state consistent
@@ -1312,37 +1689,14 @@ class BlackjackView(discord.ui.View):
             if not game:
                 return
 
-            with db_connect() as conn:
-                conn.execute("BEGIN IMMEDIATE")
+            new_wallet, newly = await _db(_do_bj_finish, gid, uid, game, outcome, payout, net)
 
-                if payout:
-                    new_wallet = update_wallet(conn, interaction.guild.id, interaction.user.id, payout)
-                else:
-                    new_wallet = int(get_user(conn, interaction.guild.id, interaction.user.id)["wallet"])
-
-                apply_blackjack_stats(conn, interaction.guild.id, interaction.user.id, game.bet, net, outcome)
-
-                newly = []
-                if achievements_enabled(conn, interaction.guild.id):
-                    if is_natural_blackjack(game.player):
-                        r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "bj_blackjack")
-                        if r is not None:
-                            update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                            newly.append(("Natural Blackjack", r))
-                    if game.doubled and outcome == "win":
-                        r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "bj_double")
-                        if r is not None:
-                            update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                            newly.append(("Double Trouble", r))
-
-                conn.commit()
-
-            game.done = True
             BJ_GAMES.pop(key, None)
             BJ_LOCKS.pop(key, None)
 
         # Render + edit OUTSIDE lock (keeps clicks snappy)
         self.clear_items()
+        self.stop()  # no on_timeout later: it would pop whatever game this user has started since
         embed = self._render(game, reveal_dealer=True)
 
         net_text = f"+{net:,}" if net >= 0 else f"{net:,}"
@@ -1351,7 +1705,7 @@ class BlackjackView(discord.ui.View):
         if note:
             desc = note + "\n" + desc
         if newly:
-            desc += "\n\n🏆 **Achievement unlocked:** " + ", ".join([f"{n} (+{r:,})" for n, r in newly])
+            desc += fmt_unlocked(newly)
 
         embed.description = desc
         await _bj_edit(interaction, embed=embed, view=self)
@@ -1359,26 +1713,26 @@ class BlackjackView(discord.ui.View):
     async def _dealer_and_resolve(self, interaction: discord.Interaction):
         await _bj_defer_update(interaction)
 
-        key = (interaction.guild.id, interaction.user.id)
+        key = _bj_key(interaction.guild.id, interaction.user.id)
         lock = _bj_lock(key)
 
         async with lock:
             game = BJ_GAMES.get(key)
-            if not game or game.done:
+            if not game:
                 return await _bj_reply(interaction, "No active blackjack game.", ephemeral=True)
 
             while True:
-                dv = hand_value(game.dealer)
+                dv = game.dealer_value
                 if dv < 17:
-                    game.dealer.append(draw_card(game.deck))
+                    game.deal_dealer()
                     continue
-                if dv == 17 and (not BJ_DEALER_STANDS_SOFT_17) and is_soft(game.dealer):
-                    game.dealer.append(draw_card(game.deck))
+                if dv == 17 and (not BJ_DEALER_STANDS_SOFT_17) and game.dealer_soft:
+                    game.deal_dealer()
                     continue
                 break
 
-            pv = hand_value(game.player)
-            dv = hand_value(game.dealer)
+            pv = game.player_value
+            dv = game.dealer_value
             outcome, payout, net = self._compute_outcome(game.bet, pv, dv)
 
         await self._finish(interaction, outcome, payout=payout, net=net)
@@ -1387,7 +1741,7 @@ class BlackjackView(discord.ui.View):
     async def hit(self, interaction: discord.Interaction, _: discord.ui.Button):
         await _bj_defer_update(interaction)
 
-        key = (interaction.guild.id, interaction.user.id)
+        key = _bj_key(interaction.guild.id, interaction.user.id)
         lock = _bj_lock(key)
 
         busted = False
@@ -1395,11 +1749,11 @@ class BlackjackView(discord.ui.View):
 
         async with lock:
             game = BJ_GAMES.get(key)
-            if not game or game.done:
+            if not game:
                 return await _bj_reply(interaction, "No active blackjack game.", ephemeral=True)
 
-            game.player.append(draw_card(game.deck))
-            pv = hand_value(game.player)
+            game.deal_player()
+            pv = game.player_value
 
             if pv > 21:
                 busted = True
@@ -1422,7 +1776,8 @@ class BlackjackView(discord.ui.View):
         if not BJ_ALLOW_DOUBLE:
             return await _bj_reply(interaction, "Doubling is disabled.", ephemeral=True)
 
-        key = (interaction.guild.id, interaction.user.id)
+        gid, uid = interaction.guild.id, interaction.user.id
+        key = _bj_key(gid, uid)
         lock = _bj_lock(key)
 
         busted = False
@@ -1430,28 +1785,21 @@ class BlackjackView(discord.ui.View):
 
         async with lock:
             game = BJ_GAMES.get(key)
-            if not game or game.done:
+            if not game:
                 return await _bj_reply(interaction, "No active blackjack game.", ephemeral=True)
 
             if len(game.player) != 2 or game.doubled:
                 return await _bj_reply(interaction, "You can only double right after the deal.", ephemeral=True)
 
-            # Charge the extra bet (can be slow) BUT we already deferred so it's safe
-            with db_connect() as conn:
-                conn.execute("BEGIN IMMEDIATE")
-                row = get_user(conn, interaction.guild.id, interaction.user.id)
-                wallet = int(row["wallet"])
-                if game.bet > wallet:
-                    conn.rollback()
-                    return await _bj_reply(interaction, "Not enough coins to double.", ephemeral=True)
-                update_wallet(conn, interaction.guild.id, interaction.user.id, -game.bet)
-                conn.commit()
+            # take the extra stake now, conditionally, so nothing can spend those coins before _finish
+            if not await _db(_do_try_wallet_delta, gid, uid, -game.bet):
+                return await _bj_reply(interaction, "Not enough coins to double.", ephemeral=True)
 
             game.bet *= 2
             game.doubled = True
-            game.player.append(draw_card(game.deck))
+            game.deal_player()
 
-            pv = hand_value(game.player)
+            pv = game.player_value
             if pv > 21:
                 busted = True
                 busted_net = -game.bet
@@ -1468,12 +1816,12 @@ class BlackjackView(discord.ui.View):
         if not BJ_ALLOW_SURRENDER:
             return await _bj_reply(interaction, "Surrender is disabled.", ephemeral=True)
 
-        key = (interaction.guild.id, interaction.user.id)
+        key = _bj_key(interaction.guild.id, interaction.user.id)
         lock = _bj_lock(key)
 
         async with lock:
             game = BJ_GAMES.get(key)
-            if not game or game.done:
+            if not game:
                 return await _bj_reply(interaction, "No active blackjack game.", ephemeral=True)
 
             if len(game.player) != 2 or game.doubled:
@@ -1498,28 +1846,25 @@ async def blackjack(interaction: discord.Interaction, bet: int):
             ephemeral=True
         )
 
-    key = (interaction.guild.id, interaction.user.id)
-    if key in BJ_GAMES:
-        return await interaction.response.send_message("You already have an active blackjack game.", ephemeral=True)
+    gid, uid = interaction.guild.id, interaction.user.id
+    key = _bj_key(gid, uid)
+    # held across the stake write so two quick /blackjack calls can't both start a game
+    async with _bj_lock(key):
+        if key in BJ_GAMES:
+            return await interaction.response.send_message("You already have an active blackjack game.", ephemeral=True)
 
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
-        wallet = int(row["wallet"])
-        if bet > wallet:
-            conn.rollback()
+        charged, wallet = await _db(_do_stake, gid, uid, bet)
+        if not charged:
             return await interaction.response.send_message(
                 embed=discord.Embed(title="Not enough coins", description=f"You have **{wallet:,}** coins."),
                 ephemeral=True
             )
-        update_wallet(conn, interaction.guild.id, interaction.user.id, -bet)
-        conn.commit()
 
-    deck = new_deck()
-    game = BJGame(bet=bet, deck=deck, player=[draw_card(deck), draw_card(deck)], dealer=[draw_card(deck), draw_card(deck)])
-    BJ_GAMES[key] = game
+        deck = new_deck()
+        game = BJGame(bet=bet, deck=deck, player=[deck.pop(), deck.pop()], dealer=[deck.pop(), deck.pop()])
+        BJ_GAMES[key] = game
 
-    view = BlackjackView(interaction.guild.id, interaction.user.id)
+    view = BlackjackView(gid, uid)
     embed = view._render(game, reveal_dealer=False)
 
     # Send the game
@@ -1543,39 +1888,24 @@ async def blackjack(interaction: discord.Interaction, bet: int):
 import asyncio
 import secrets
 
-RANK_ORDER = {r: i for i, r in enumerate(["2","3","4","5","6","7","8","9","10","J","Q","K","A"], start=2)}
+# poker rank value (2..14, aces high) per card; the suit is c & 3
+CARD_POKER_RANK: List[int] = [14 if c < 4 else (c >> 2) + 1 for c in range(52)]
 
-def card_rank(c: str) -> str:
-    return c[:-1]
-
-def card_suit(c: str) -> str:
-    return c[-1]
-
-def poker_score_5(cards: List[str]) -> Tuple[int, List[int]]:
-    ranks = [card_rank(c) for c in cards]
-    suits = [card_suit(c) for c in cards]
-    vals = sorted([RANK_ORDER[r] for r in ranks], reverse=True)
+def poker_score_5(cards: List[int]) -> Tuple[int, List[int]]:
+    vals = sorted([CARD_POKER_RANK[c] for c in cards], reverse=True)
 
     counts: Dict[int, int] = {}
+    rank_mask = 0
     for v in vals:
         counts[v] = counts.get(v, 0) + 1
+        rank_mask |= 1 << (v - 2)
     groups = sorted(counts.items(), key=lambda x: (x[1], x[0]), reverse=True)
 
-    is_flush = len(set(suits)) == 1
-
-    unique = sorted(set(vals), reverse=True)
-    is_straight = False
-    top_straight = None
-    if len(unique) >= 5:
-        for i in range(len(unique) - 4):
-            window = unique[i:i+5]
-            if window[0] - window[4] == 4:
-                is_straight = True
-                top_straight = window[0]
-                break
-        if not is_straight and set([14,5,4,3,2]).issubset(set(vals)):
-            is_straight = True
-            top_straight = 5
+    suit0 = cards[0] & 3
+    is_flush = all(c & 3 == suit0 for c in cards)
+
+    top_straight = _STRAIGHT_TOP[rank_mask]
+    is_straight = top_straight != 0
 
     if is_straight and is_flush:
         return (8, [top_straight])
@@ -1614,18 +1944,79 @@ def poker_score_5(cards: List[str]) -> Tuple[int, List[int]]:
 
     return (0, vals)
 
-def poker_best_7(cards7: List[str]) -> Tuple[int, List[int]]:
-    best = None
-    for combo in itertools.combinations(cards7, 5):
-        score = poker_score_5(list(combo))
-        if best is None or score > best:
-            best = score
-    return best if best is not None else (0, [])
+# 13-bit rank masks (bit v-2 set <=> rank value v present), tables built once at import
+def _straight_top_of(mask: int) -> int:
+    # bit b of run is set <=> bits b..b+4 are all set; the highest run ends at value b+6
+    run = mask & (mask >> 1) & (mask >> 2) & (mask >> 3) & (mask >> 4)
+    if run:
+        return run.bit_length() + 5
+    wheel = (1 << 12) | 0b1111  # A,2,3,4,5
+    return 5 if mask & wheel == wheel else 0
+
+_STRAIGHT_TOP: List[int] = [_straight_top_of(m) for m in range(1 << 13)]
+_MASK_RANKS: List[Tuple[int, ...]] = [tuple(v for v in range(14, 1, -1) if m >> (v - 2) & 1) for m in range(1 << 13)]
+
+def poker_best_7(cards7: List[int]) -> Tuple[int, List[int]]:
+    """
+    Best 5-card score out of 5-7 cards, same (category, tiebreakers) shape
+    as poker_score_5, computed straight from the four per-suit rank masks
+    (bitwise ops + the 13-bit tables) instead of scoring every 5-card
+    combination.
+    """
+    suit_masks = [0, 0, 0, 0]
+    for c in cards7:
+        suit_masks[c & 3] |= 1 << (CARD_POKER_RANK[c] - 2)
+    s0, s1, s2, s3 = suit_masks
+
+    # with <= 7 cards a flush rules out quads and full houses
+    for m in suit_masks:
+        ranks = _MASK_RANKS[m]
+        if len(ranks) >= 5:
+            top = _STRAIGHT_TOP[m]
+            if top:
+                return (8, [top])
+            return (5, list(ranks[:5]))
+
+    # multiplicities straight from the suit masks: a rank held in k suits appears k times
+    rank_mask = s0 | s1 | s2 | s3
+    two_up = (s0 & s1) | (s0 & s2) | (s0 & s3) | (s1 & s2) | (s1 & s3) | (s2 & s3)
+    three_up = (s0 & s1 & (s2 | s3)) | (s2 & s3 & (s0 | s1))
+    four = s0 & s1 & s2 & s3
+    quads = _MASK_RANKS[four]
+    trips = _MASK_RANKS[three_up & ~four]
+    pairs = _MASK_RANKS[two_up & ~three_up]
+    present = _MASK_RANKS[rank_mask]
+
+    if quads:
+        q = quads[0]
+        return (7, [q, next(v for v in present if v != q)])
+
+    if trips and (len(trips) > 1 or pairs):
+        second = max(trips[1] if len(trips) > 1 else 0, pairs[0] if pairs else 0)
+        return (6, [trips[0], second])
+
+    top = _STRAIGHT_TOP[rank_mask]
+    if top:
+        return (4, [top])
+
+    if trips:
+        t = trips[0]
+        return (3, [t] + [v for v in present if v != t][:2])
+
+    if len(pairs) >= 2:
+        hi, lo = pairs[0], pairs[1]
+        return (2, [hi, lo, next(v for v in present if v != hi and v != lo)])
+
+    if pairs:
+        p = pairs[0]
+        return (1, [p] + [v for v in present if v != p][:3])
+
+    return (0, list(present[:5]))
 
 def _stage_name(stage: int) -> str:
     return ["Preflop", "Flop", "Turn", "River", "Showdown"][stage]
 
-def _community_for_stage(full_board: List[str], stage: int) -> List[str]:
+def _community_for_stage(full_board: List[int], stage: int) -> List[int]:
     if stage <= 0:
         return []
     if stage == 1:
@@ -1634,18 +2025,40 @@ def _community_for_stage(full_board: List[str], stage: int) -> List[str]:
         return full_board[:4]
     return full_board[:5]
 
+def _do_try_wallet_delta(guild_id: int, user_id: int, delta: int) -> bool:
+    # one autocommitted statement in the common case: no BEGIN, no SELECT, nothing to roll back
+    with db_connect() as conn:
+        if conn.execute(_SQL_TRY_WALLET_DELTA, (delta, guild_id, user_id, delta, delta)).fetchone() is not None:
+            mark_lb_dirty(guild_id, "wallet")
+            return True
+        if delta < 0:
+            return False  # short, or no row yet (which holds 0 coins)
+        update_wallet(conn, guild_id, user_id, delta)  # no row yet: the upsert creates it
+        return True
+
+def _do_holdem_finish(guild_id: int, user_id: int, invested: int, payout: int, won: bool) -> int:
+    # stats, the win achievement and the payout in one transaction -> final wallet
+    with db_connect() as conn, tx(conn):
+        apply_holdem_stats(conn, guild_id, user_id, invested, payout - invested, won=won)
+        reward = 0
+        if won and achievements_enabled(conn, guild_id):
+            hit = unlock_achievement(conn, guild_id, user_id, "holdem_win")
+            if hit is not None:
+                reward = hit[1]
+        return update_wallet(conn, guild_id, user_id, payout + reward)
+
 HE_BOT_CALL_MAX_PCT_OF_POT = 60
 HE_BOT_RAISE_CHANCE = 12
 HE_BOT_RAISE_PCT_OF_POT = 40
 
-@dataclass
+@dataclass(slots=True)
 class HoldemHU:
+    # all 9 cards are dealt when the game starts; there is no deck to keep
     game_id: str
     ante: int
-    deck: List[str]
-    player_hole: List[str]
-    bot_hole: List[str]
-    full_board: List[str]
+    player_hole: List[int]
+    bot_hole: List[int]
+    full_board: List[int]
     stage: int = 0
     pot: int = 0
     to_call_player: int = 0
@@ -1654,17 +2067,34 @@ class HoldemHU:
     invested_bot: int = 0
     done: bool = False
     last_action: str = ""
+    # hole cards never change after the deal, so their text is built once for _render
+    player_hole_str: str = ""
+    bot_hole_str: str = ""
+    board_strs: Tuple[str, ...] = ()    # board text per stage (preflop .. showdown)
+
+    def __post_init__(self) -> None:
+        self.player_hole_str = " ".join(CARD_STR[c] for c in self.player_hole)
+        self.bot_hole_str = " ".join(CARD_STR[c] for c in self.bot_hole)
+        self.board_strs = tuple(
+            " ".join(CARD_STR[c] for c in _community_for_stage(self.full_board, st)) or "—"
+            for st in range(5)
+        )
 
 HE_HU_GAMES_BY_ID: Dict[str, HoldemHU] = {}
 HE_HU_ACTIVE_BY_USER: Dict[Tuple[int, int], str] = {}
 HE_HU_LOCKS: Dict[Tuple[int, int], asyncio.Lock] = {}
 
 def _he_lock_for(key: Tuple[int, int]) -> asyncio.Lock:
+    # hit: one lookup; miss: setdefault, so a Lock is only built when the key is new
     lock = HE_HU_LOCKS.get(key)
-    if lock is None:
-        lock = asyncio.Lock()
-        HE_HU_LOCKS[key] = lock
-    return lock
+    return lock if lock is not None else HE_HU_LOCKS.setdefault(key, asyncio.Lock())
+
+def _he_drop_game(key: Tuple[int, int], game_id: str) -> None:
+    HE_HU_GAMES_BY_ID.pop(game_id, None)
+    # pop first, put back only in the rare case the user has since started another game
+    active_id = HE_HU_ACTIVE_BY_USER.pop(key, None)
+    if active_id is not None and active_id != game_id:
+        HE_HU_ACTIVE_BY_USER[key] = active_id
 
 class HoldemHUView(discord.ui.View):
     def __init__(self, guild_id: int, user_id: int, game_id: str, timeout: float = 90.0):
@@ -1672,6 +2102,9 @@ class HoldemHUView(discord.ui.View):
         self.guild_id = guild_id
         self.user_id = user_id
         self.game_id = game_id
+        # last embed _render built, plus the state its fields show (footer excluded)
+        self._embed: Optional[discord.Embed] = None
+        self._embed_key: Optional[tuple] = None
 
     # ---------- UI helpers ----------
     @staticmethod
@@ -1683,11 +2116,8 @@ class HoldemHUView(discord.ui.View):
             return f"Call {self._fmt(game.to_call_player)} / Raise / Fold"
         return "Check / Bet / Fold"
 
-    def _sync_buttons(self, game: HoldemHU, wallet: Optional[int] = None) -> None:
+    def _sync_buttons(self, game: HoldemHU, wallet: int) -> None:
         """Update button labels + disabled state to match the current street."""
-        if wallet is None:
-            wallet = self._get_player_wallet(self.guild_id, self.user_id)
-
         # dynamic labels
         if game.to_call_player > 0:
             self.check_call.label = f"Call ({self._fmt(game.to_call_player)})"
@@ -1708,11 +2138,7 @@ class HoldemHUView(discord.ui.View):
         return True
 
     async def on_timeout(self) -> None:
-        key = (self.guild_id, self.user_id)
-        active_id = HE_HU_ACTIVE_BY_USER.get(key)
-        if active_id == self.game_id:
-            HE_HU_ACTIVE_BY_USER.pop(key, None)
-        HE_HU_GAMES_BY_ID.pop(self.game_id, None)
+        _he_drop_game((self.guild_id, self.user_id), self.game_id)
 
     async def _get_game_or_reply(self, interaction: discord.Interaction) -> Optional[HoldemHU]:
         game = HE_HU_GAMES_BY_ID.get(self.game_id)
@@ -1721,14 +2147,28 @@ class HoldemHUView(discord.ui.View):
             return None
         return game
 
-    def _render(self, game: HoldemHU, reveal_bot: bool = False, wallet_override: Optional[int] = None) -> discord.Embed:
-        comm = _community_for_stage(game.full_board, game.stage)
-        board_text = " ".join(comm) if comm else "—"
+    def _set_footer(self, embed: discord.Embed, game: HoldemHU) -> None:
+        hint = self._primary_hint(game)
+        if game.last_action:
+            embed.set_footer(text=f"{game.last_action} • {hint}")
+        else:
+            embed.set_footer(text=hint)
 
-        ph = " ".join(game.player_hole)
-        bh = " ".join(game.bot_hole) if reveal_bot else "?? ??"
+    def _render(self, game: HoldemHU, wallet: int, reveal_bot: bool = False) -> discord.Embed:
+        # keep buttons in sync with what render shows
+        self._sync_buttons(game, wallet=wallet)
+
+        key = (game.stage, game.pot, wallet, game.to_call_player, game.invested_player,
+               game.invested_bot, game.done, reveal_bot)
+        if key == self._embed_key:
+            # only the last-action text moved: patch the footer, keep the fields
+            self._set_footer(self._embed, game)
+            return self._embed
 
-        wallet = wallet_override if wallet_override is not None else self._get_player_wallet(self.guild_id, self.user_id)
+        board_text = game.board_strs[game.stage]
+
+        ph = game.player_hole_str
+        bh = game.bot_hole_str if reveal_bot else "?? ??"
 
         # Color by state
         if game.done:
@@ -1759,47 +2199,28 @@ class HoldemHUView(discord.ui.View):
         embed.add_field(name="Bot Hole", value=f"`{bh}`", inline=True)
 
         # Footer prompt / last action
-        hint = self._primary_hint(game)
-        if game.last_action:
-            embed.set_footer(text=f"{game.last_action} • {hint}")
-        else:
-            embed.set_footer(text=hint)
-
-        # keep buttons in sync with what render shows
-        self._sync_buttons(game, wallet=wallet)
+        self._set_footer(embed, game)
 
+        self._embed, self._embed_key = embed, key
         return embed
 
-    def _get_player_wallet(self, guild_id: int, user_id: int) -> int:
-        with db_connect() as conn:
-            row = get_user(conn, guild_id, user_id)
-            return int(row["wallet"])
+    async def _get_player_wallet(self, guild_id: int, user_id: int) -> int:
+        return await _db(get_wallet, guild_id, user_id)
 
     async def _safe_wallet_delta(self, guild_id: int, user_id: int, delta: int) -> bool:
-        with db_connect() as conn:
-            conn.execute("BEGIN IMMEDIATE")
-            row = get_user(conn, guild_id, user_id)
-            wallet = int(row["wallet"])
-            if delta < 0 and (-delta) > wallet:
-                conn.rollback()
-                return False
-            update_wallet(conn, guild_id, user_id, delta)
-            conn.commit()
-        return True
+        return await _db(_do_try_wallet_delta, guild_id, user_id, delta)
 
     def _bot_decision(self, game: HoldemHU) -> str:
+        # one uniform roll per decision; random() < p/100 has the same odds as randint(1, 100) <= p
+        roll = _rng.random()
         if game.to_call_bot <= 0:
-            if random.randint(1, 100) <= HE_BOT_RAISE_CHANCE:
-                return "raise"
-            return "check"
+            return "raise" if roll < HE_BOT_RAISE_CHANCE * 0.01 else "check"
 
         pot_if_call = game.pot + game.to_call_bot
         pct = 100 if pot_if_call <= 0 else int((game.to_call_bot * 100) / max(1, pot_if_call))
         if pct <= HE_BOT_CALL_MAX_PCT_OF_POT:
-            if random.randint(1, 100) <= 10:
-                return "raise"
-            return "call"
-        return "call" if random.randint(1, 100) <= 25 else "fold"
+            return "raise" if roll < 0.10 else "call"
+        return "call" if roll < 0.25 else "fold"
 
     def _next_stage(self, game: HoldemHU) -> None:
         game.to_call_player = 0
@@ -1812,41 +2233,27 @@ class HoldemHUView(discord.ui.View):
         return game.stage >= 4
 
     async def _finish(self, interaction: discord.Interaction, game: HoldemHU, player_won: Optional[bool], note: str):
-        key = (interaction.guild.id, interaction.user.id)
+        gid, uid = interaction.guild.id, interaction.user.id
+        key = (gid, uid)
 
         payout = 0
         if player_won is True:
             payout = game.pot
-            await self._safe_wallet_delta(interaction.guild.id, interaction.user.id, payout)
         elif player_won is None:
             payout = game.invested_player
-            await self._safe_wallet_delta(interaction.guild.id, interaction.user.id, payout)
 
         net = payout - game.invested_player
 
-        with db_connect() as conn:
-            conn.execute("BEGIN IMMEDIATE")
-            apply_holdem_stats(conn, interaction.guild.id, interaction.user.id, game.invested_player, net, won=(player_won is True))
-            if (player_won is True) and achievements_enabled(conn, interaction.guild.id):
-                r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "holdem_win")
-                if r is not None:
-                    update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-            conn.commit()
-
-        # Fetch FINAL balance after payout + stats rewards
-        final_wallet = self._get_player_wallet(interaction.guild.id, interaction.user.id)
+        final_wallet = await _db(_do_holdem_finish, gid, uid, game.invested_player, payout, player_won is True)
 
         game.done = True
 
-        active_id = HE_HU_ACTIVE_BY_USER.get(key)
-        if active_id == game.game_id:
-            HE_HU_ACTIVE_BY_USER.pop(key, None)
-        HE_HU_GAMES_BY_ID.pop(game.game_id, None)
+        _he_drop_game(key, game.game_id)
 
         self.clear_items()
 
         # Build end screen
-        embed = self._render(game, reveal_bot=True, wallet_override=final_wallet)
+        embed = self._render(game, final_wallet, reveal_bot=True)
 
         net_text = f"+{self._fmt(net)}" if net >= 0 else f"{self._fmt(net)}"
         result = "Push" if player_won is None else ("You win" if player_won else "You lose")
@@ -1874,6 +2281,7 @@ class HoldemHUView(discord.ui.View):
 
     async def _bot_act(self, interaction: discord.Interaction, game: HoldemHU):
         decision = self._bot_decision(game)
+        player_wallet: Optional[int] = None
 
         if decision == "fold":
             game.last_action = "Bot folded."
@@ -1892,7 +2300,7 @@ class HoldemHUView(discord.ui.View):
 
         elif decision == "raise":
             # Bot cannot raise more than the player can cover (prevents forced folds)
-            player_wallet = self._get_player_wallet(interaction.guild.id, interaction.user.id)
+            player_wallet = await self._get_player_wallet(interaction.guild.id, interaction.user.id)
 
             base_pot = max(1, game.pot)
             raise_amt = max(game.ante, (base_pot * HE_BOT_RAISE_PCT_OF_POT) // 100)
@@ -1932,10 +2340,13 @@ class HoldemHUView(discord.ui.View):
             await self._resolve_showdown(interaction, game)
             return
 
-        await interaction.response.edit_message(embed=self._render(game, reveal_bot=False), view=self)
+        if player_wallet is None:
+            player_wallet = await self._get_player_wallet(interaction.guild.id, interaction.user.id)
+        await interaction.response.edit_message(embed=self._render(game, player_wallet), view=self)
 
     async def _player_bet_or_raise(self, interaction: discord.Interaction, amount: int):
-        key = (interaction.guild.id, interaction.user.id)
+        gid, uid = interaction.guild.id, interaction.user.id
+        key = (gid, uid)
         async with _he_lock_for(key):
             game = HE_HU_GAMES_BY_ID.get(self.game_id)
             if not game or game.done:
@@ -1946,7 +2357,7 @@ class HoldemHUView(discord.ui.View):
 
             total = game.to_call_player + amount
 
-            ok = await self._safe_wallet_delta(interaction.guild.id, interaction.user.id, -total)
+            ok = await self._safe_wallet_delta(gid, uid, -total)
             if not ok:
                 return await interaction.response.send_message("You don't have enough coins for that bet/raise.", ephemeral=True)
 
@@ -1961,7 +2372,8 @@ class HoldemHUView(discord.ui.View):
 
     @discord.ui.button(label="Check", style=discord.ButtonStyle.success)
     async def check_call(self, interaction: discord.Interaction, _: discord.ui.Button):
-        key = (interaction.guild.id, interaction.user.id)
+        gid, uid = interaction.guild.id, interaction.user.id
+        key = (gid, uid)
         async with _he_lock_for(key):
             game = await self._get_game_or_reply(interaction)
             if not game:
@@ -1969,7 +2381,7 @@ class HoldemHUView(discord.ui.View):
 
             if game.to_call_player > 0:
                 need = game.to_call_player
-                ok = await self._safe_wallet_delta(interaction.guild.id, interaction.user.id, -need)
+                ok = await self._safe_wallet_delta(gid, uid, -need)
                 if not ok:
                     return await interaction.response.send_message("You don't have enough coins to call.", ephemeral=True)
 
@@ -2014,10 +2426,7 @@ class BetModal(discord.ui.Modal, title="Hold'em Bet / Raise"):
 
     async def on_submit(self, interaction: discord.Interaction):
         view = self.view_ref
-        game = HE_HU_GAMES_BY_ID.get(view.game_id)
-        if not game or game.done:
-            return await interaction.response.send_message("No active Hold'em game.", ephemeral=True)
-
+        # no game lookup here: _player_bet_or_raise checks the game under the lock
         try:
             amt = int(str(self.amount).strip())
         except ValueError:
@@ -2038,60 +2447,90 @@ async def holdem(interaction: discord.Interaction, ante: int):
             ephemeral=True
         )
 
-    key = (interaction.guild.id, interaction.user.id)
+    gid, uid = interaction.guild.id, interaction.user.id
+    key = (gid, uid)
 
-    active_id = HE_HU_ACTIVE_BY_USER.get(key)
-    if active_id:
-        g = HE_HU_GAMES_BY_ID.get(active_id)
-        if g and not g.done:
-            return await interaction.response.send_message("You already have an active Hold'em game.", ephemeral=True)
-        HE_HU_ACTIVE_BY_USER.pop(key, None)
-        HE_HU_GAMES_BY_ID.pop(active_id, None)
+    # held across the ante write so two quick /holdem calls can't both start a game
+    async with _he_lock_for(key):
+        active_id = HE_HU_ACTIVE_BY_USER.get(key)
+        if active_id:
+            g = HE_HU_GAMES_BY_ID.get(active_id)
+            if g and not g.done:
+                return await interaction.response.send_message("You already have an active Hold'em game.", ephemeral=True)
+            HE_HU_ACTIVE_BY_USER.pop(key, None)
+            HE_HU_GAMES_BY_ID.pop(active_id, None)
 
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
-        if ante > int(row["wallet"]):
-            conn.rollback()
+        charged, wallet = await _db(_do_stake, gid, uid, ante)
+        if not charged:
             return await interaction.response.send_message("You don't have enough coins to ante.", ephemeral=True)
-        update_wallet(conn, interaction.guild.id, interaction.user.id, -ante)
-        conn.commit()
-
-    deck = new_deck()
-    player_hole = [draw_card(deck), draw_card(deck)]
-    bot_hole = [draw_card(deck), draw_card(deck)]
-    full_board = [draw_card(deck) for _ in range(5)]
-
-    game_id = secrets.token_hex(8)
-
-    game = HoldemHU(
-        game_id=game_id,
-        ante=ante,
-        deck=deck,
-        player_hole=player_hole,
-        bot_hole=bot_hole,
-        full_board=full_board,
-        stage=0,
-        pot=ante * 2,
-        to_call_player=0,
-        to_call_bot=0,
-        invested_player=ante,
-        invested_bot=ante,
-        done=False,
-        last_action=f"Both anted **{ante:,}**. Your move."
-    )
 
-    HE_HU_GAMES_BY_ID[game_id] = game
-    HE_HU_ACTIVE_BY_USER[key] = game_id
+        # only 9 cards are ever dealt, so sample them instead of shuffling a whole deck
+        picks = _rng.sample(range(52), 9)
+        player_hole, bot_hole, full_board = picks[0:2], picks[2:4], picks[4:9]
+
+        game_id = secrets.token_hex(8)
+
+        game = HoldemHU(
+            game_id=game_id,
+            ante=ante,
+            player_hole=player_hole,
+            bot_hole=bot_hole,
+            full_board=full_board,
+            stage=0,
+            pot=ante * 2,
+            to_call_player=0,
+            to_call_bot=0,
+            invested_player=ante,
+            invested_bot=ante,
+            done=False,
+            last_action=f"Both anted **{ante:,}**. Your move."
+        )
+
+        HE_HU_GAMES_BY_ID[game_id] = game
+        HE_HU_ACTIVE_BY_USER[key] = game_id
 
-    view = HoldemHUView(interaction.guild.id, interaction.user.id, game_id=game_id)
-    await interaction.response.send_message(embed=view._render(game, reveal_bot=False), view=view)
+    view = HoldemHUView(gid, uid, game_id=game_id)
+    await interaction.response.send_message(embed=view._render(game, wallet - ante), view=view)
 
 # ----------------------------
 # SHOP / COLLECTIBLES
 # ----------------------------
+# items are only written by db_init's seeding at startup, so the rendered pages never go stale
+_shop_pages: Optional[List[str]] = None
+
+def _build_shop_pages() -> List[str]:
+    with db_connect() as conn:
+        rows = conn.execute(
+            "SELECT item_id, name, price, description FROM items ORDER BY price ASC"
+        ).fetchall()
+
+    pages = []
+    cur_lines = []
+    cur_len = 0
+
+    # Discord embed description hard limit is 4096 chars; keep a safety margin.
+    MAX_DESC = 3800
+
+    for r in rows:
+        line = f"**{r['item_id']}** — {r['name']} — **{int(r['price']):,}**\n_{r['description']}_"
+        add_len = len(line) + 2  # + spacing
+
+        if cur_len + add_len > MAX_DESC and cur_lines:
+            pages.append("\n\n".join(cur_lines))
+            cur_lines = [line]
+            cur_len = len(line)
+        else:
+            cur_lines.append(line)
+            cur_len += add_len
+
+    if cur_lines:
+        pages.append("\n\n".join(cur_lines))
+
+    return pages
+
 @bot.tree.command(name="shop", description="View collectible items you can buy.")
 async def shop(interaction: discord.Interaction):
+    global _shop_pages
     guild_err = require_guild(interaction)
     if guild_err:
         return await interaction.response.send_message(embed=guild_err, ephemeral=True)
@@ -2100,39 +2539,16 @@ async def shop(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
 
     try:
-        with db_connect() as conn:
-            rows = conn.execute(
-                "SELECT item_id, name, price, description FROM items ORDER BY price ASC"
-            ).fetchall()
+        if _shop_pages is None:
+            _shop_pages = await _db(_build_shop_pages)
+        pages = _shop_pages
 
-        if not rows:
+        if not pages:
             return await interaction.followup.send(
                 embed=discord.Embed(title="Shop", description="No items yet."),
                 ephemeral=True
             )
 
-        pages = []
-        cur_lines = []
-        cur_len = 0
-
-        # Discord embed description hard limit is 4096 chars; keep a safety margin.
-        MAX_DESC = 3800
-
-        for r in rows:
-            line = f"**{r['item_id']}** — {r['name']} — **{int(r['price']):,}**\n_{r['description']}_"
-            add_len = len(line) + 2  # + spacing
-
-            if cur_len + add_len > MAX_DESC and cur_lines:
-                pages.append("\n\n".join(cur_lines))
-                cur_lines = [line]
-                cur_len = len(line)
-            else:
-                cur_lines.append(line)
-                cur_len += add_len
-
-        if cur_lines:
-            pages.append("\n\n".join(cur_lines))
-
         # Send first page
         total_pages = len(pages)
         embed = discord.Embed(
@@ -2160,69 +2576,85 @@ async def shop(interaction: discord.Interaction):
             ephemeral=True
         )
 
-@bot.tree.command(name="buy", description="Buy a collectible item from /shop.")
-@app_commands.describe(item_id="The item id", qty="How many to buy")
-async def buy(interaction: discord.Interaction, item_id: str, qty: int = 1):
-    guild_err = require_guild(interaction)
-    if guild_err:
-        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
-
-    if qty < 1 or qty > 100_000_000:
-        return await interaction.response.send_message(embed=discord.Embed(title="Invalid qty", description="Qty must be 1–99."), ephemeral=True)
-
-    item_id = item_id.strip()
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
+@dataclass
+class BuyResult:
+    found: bool = True          # False: unknown item_id
+    short: bool = False         # cost > wallet; nothing was written
+    wallet: int = 0
+    name: str = ""
+    cost: int = 0
+    newly: List[Tuple[str, int]] = field(default_factory=list)
+
+def _do_buy(guild_id: int, user_id: int, item_id: str, qty: int) -> BuyResult:
+    with db_connect() as conn, tx(conn):
         item = conn.execute("SELECT name, price FROM items WHERE item_id=?", (item_id,)).fetchone()
         if not item:
             conn.rollback()
-            return await interaction.response.send_message(embed=discord.Embed(title="Not found", description="That item_id doesn't exist."), ephemeral=True)
+            return BuyResult(found=False)
 
         cost = int(item["price"]) * qty
-        row = get_user(conn, interaction.guild.id, interaction.user.id)
-        wallet = int(row["wallet"])
+        wallet = int(get_user(conn, guild_id, user_id)["wallet"])
         if cost > wallet:
             conn.rollback()
-            return await interaction.response.send_message(embed=discord.Embed(title="Not enough coins", description=f"Cost: **{cost:,}**. You have **{wallet:,}**."), ephemeral=True)
-
-        update_wallet(conn, interaction.guild.id, interaction.user.id, -cost)
+            return BuyResult(short=True, wallet=wallet, cost=cost)
 
         conn.execute("""
             INSERT INTO inventory (guild_id, user_id, item_id, qty)
             VALUES (?, ?, ?, ?)
             ON CONFLICT(guild_id, user_id, item_id) DO UPDATE SET qty = qty + excluded.qty
-        """, (str(interaction.guild.id), str(interaction.user.id), item_id, qty))
+        """, (guild_id, user_id, item_id, qty))
 
         newly = []
-        if achievements_enabled(conn, interaction.guild.id):
-            r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "first_buy")
-            if r is not None:
-                update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                newly.append(("First Purchase", r))
+        if achievements_enabled(conn, guild_id):
+            hit = unlock_achievement(conn, guild_id, user_id, "first_buy")
+            if hit is not None:
+                newly.append(hit)
 
-        conn.commit()
+        # cost and any reward in one wallet write
+        update_wallet(conn, guild_id, user_id, -cost + sum(r for _, r in newly))
 
-    desc = f"You bought **{qty}x** **{item['name']}** for **{cost:,}** coins."
-    if newly:
-        desc += "\n\n🏆 **Achievement unlocked:** " + ", ".join([f"{n} (+{r:,})" for n, r in newly])
-    await interaction.response.send_message(embed=discord.Embed(title="Purchase complete", description=desc))
+    return BuyResult(wallet=wallet, name=item["name"], cost=cost, newly=newly)
 
-@bot.tree.command(name="inventory", description="See your collectible inventory.")
-@app_commands.describe(user="Optional: view someone else's inventory")
-async def inventory(interaction: discord.Interaction, user: Optional[discord.Member] = None):
+@bot.tree.command(name="buy", description="Buy a collectible item from /shop.")
+@app_commands.describe(item_id="The item id", qty="How many to buy")
+async def buy(interaction: discord.Interaction, item_id: str, qty: int = 1):
     guild_err = require_guild(interaction)
     if guild_err:
         return await interaction.response.send_message(embed=guild_err, ephemeral=True)
 
-    target = user or interaction.user
+    if qty < 1 or qty > 100_000_000:
+        return await interaction.response.send_message(embed=discord.Embed(title="Invalid qty", description="Qty must be 1–99."), ephemeral=True)
+
+    res = await _db(_do_buy, interaction.guild.id, interaction.user.id, item_id.strip(), qty)
+    if not res.found:
+        return await interaction.response.send_message(embed=discord.Embed(title="Not found", description="That item_id doesn't exist."), ephemeral=True)
+    if res.short:
+        return await interaction.response.send_message(embed=discord.Embed(title="Not enough coins", description=f"Cost: **{res.cost:,}**. You have **{res.wallet:,}**."), ephemeral=True)
+
+    desc = f"You bought **{qty}x** **{res.name}** for **{res.cost:,}** coins."
+    if res.newly:
+        desc += fmt_unlocked(res.newly)
+    await interaction.response.send_message(embed=discord.Embed(title="Purchase complete", description=desc))
+
+def _do_inventory(guild_id: int, user_id: int) -> List[sqlite3.Row]:
     with db_connect() as conn:
-        rows = conn.execute("""
+        return conn.execute("""
             SELECT i.item_id, it.name, i.qty
             FROM inventory i
             JOIN items it ON it.item_id = i.item_id
             WHERE i.guild_id=? AND i.user_id=? AND i.qty > 0
             ORDER BY it.price ASC
-        """, (str(interaction.guild.id), str(target.id))).fetchall()
+        """, (guild_id, user_id)).fetchall()
+
+@bot.tree.command(name="inventory", description="See your collectible inventory.")
+@app_commands.describe(user="Optional: view someone else's inventory")
+async def inventory(interaction: discord.Interaction, user: Optional[discord.Member] = None):
+    guild_err = require_guild(interaction)
+    if guild_err:
+        return await interaction.response.send_message(embed=guild_err, ephemeral=True)
+
+    target = user or interaction.user
+    rows = await _db(_do_inventory, interaction.guild.id, target.id)
 
     if not rows:
         return await interaction.response.send_message(embed=discord.Embed(title="Inventory", description=f"{target.mention} has no items yet."))
@@ -2236,6 +2668,77 @@ async def inventory(interaction: discord.Interaction, user: Optional[discord.Mem
 loan = app_commands.Group(name="loan", description="High-interest loans. Dangerous.")
 bot.tree.add_command(loan)
 
+@dataclass
+class LoanTakeResult:
+    owed: int = 0               # > 0 means a loan is already active; nothing new was written
+    fee: int = 0
+    receive: int = 0
+    newly: List[Tuple[str, int]] = field(default_factory=list)
+
+def _do_loan_take(guild_id: int, user_id: int, amount: int, now: int) -> LoanTakeResult:
+    with db_connect() as conn, tx(conn):
+        existing = loan_row(conn, guild_id, user_id)
+        if existing and int(existing["balance"]) > 0:
+            accrue_loan(conn, guild_id, user_id, now)
+            return LoanTakeResult(owed=int(loan_row(conn, guild_id, user_id)["balance"]))
+
+        fee = (amount * LOAN_ORIGINATION_FEE_PCT) // 100
+        receive = amount - fee
+        set_loan(conn, guild_id, user_id, principal=amount, balance=amount, now=now)
+
+        newly = []
+        if achievements_enabled(conn, guild_id):
+            hit = unlock_achievement(conn, guild_id, user_id, "loan_shark")
+            if hit is not None:
+                newly.append(hit)
+
+        update_wallet(conn, guild_id, user_id, receive + sum(r for _, r in newly))
+
+    return LoanTakeResult(fee=fee, receive=receive, newly=newly)
+
+def _do_loan_status(guild_id: int, user_id: int, now: int) -> Optional[sqlite3.Row]:
+    with db_connect() as conn, tx(conn):
+        accrue_loan(conn, guild_id, user_id, now)
+        return loan_row(conn, guild_id, user_id)
+
+@dataclass
+class LoanRepayResult:
+    no_loan: bool = False
+    pay: int = 0                # 0 (with no_loan False) means an empty wallet; nothing was written
+    new_bal: int = 0
+    newly: List[Tuple[str, int]] = field(default_factory=list)
+
+def _do_loan_repay(guild_id: int, user_id: int, amount: int, now: int) -> LoanRepayResult:
+    with db_connect() as conn, tx(conn):
+        accrue_loan(conn, guild_id, user_id, now)
+        row = loan_row(conn, guild_id, user_id)
+        if not row or int(row["balance"]) <= 0:
+            conn.rollback()
+            return LoanRepayResult(no_loan=True)
+
+        bal = int(row["balance"])
+        wallet = int(get_user(conn, guild_id, user_id)["wallet"])
+        pay = min(amount, wallet, bal)
+
+        if pay <= 0:
+            conn.rollback()
+            return LoanRepayResult()
+
+        new_bal = bal - pay
+        newly = []
+        if new_bal <= 0:
+            clear_loan(conn, guild_id, user_id)
+            if achievements_enabled(conn, guild_id):
+                hit = unlock_achievement(conn, guild_id, user_id, "loan_paid")
+                if hit is not None:
+                    newly.append(hit)
+        else:
+            conn.execute("UPDATE loans SET balance=? WHERE guild_id=? AND user_id=?", (new_bal, guild_id, user_id))
+
+        update_wallet(conn, guild_id, user_id, -pay + sum(r for _, r in newly))
+
+    return LoanRepayResult(pay=pay, new_bal=new_bal, newly=newly)
+
 @loan.command(name="take", description="Take a high-interest loan (very expensive).")
 @app_commands.describe(amount="How much to borrow (principal)")
 async def loan_take(interaction: discord.Interaction, amount: int):
@@ -2246,41 +2749,22 @@ async def loan_take(interaction: discord.Interaction, amount: int):
     if amount < 100 or amount > LOAN_MAX_PRINCIPAL:
         return await interaction.response.send_message(embed=discord.Embed(title="Invalid amount", description=f"Amount must be 100–{LOAN_MAX_PRINCIPAL:,}."), ephemeral=True)
 
-    now = int(time.time())
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        existing = loan_row(conn, interaction.guild.id, interaction.user.id)
-        if existing and int(existing["balance"]) > 0:
-            accrue_loan(conn, interaction.guild.id, interaction.user.id, now)
-            updated = loan_row(conn, interaction.guild.id, interaction.user.id)
-            conn.commit()
-            return await interaction.response.send_message(
-                embed=discord.Embed(title="Loan already active", description=f"You already owe **{int(updated['balance']):,}**. Repay it first."),
-                ephemeral=True
-            )
-
-        fee = (amount * LOAN_ORIGINATION_FEE_PCT) // 100
-        receive = amount - fee
-        set_loan(conn, interaction.guild.id, interaction.user.id, principal=amount, balance=amount, now=now)
-        update_wallet(conn, interaction.guild.id, interaction.user.id, receive)
-
-        newly = []
-        if achievements_enabled(conn, interaction.guild.id):
-            r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "loan_shark")
-            if r is not None:
-                update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                newly.append(("Loan Shark", r))
-
-        conn.commit()
+    res = await _db(_do_loan_take, interaction.guild.id, interaction.user.id, amount, int(time.time()))
+    if res.owed > 0:
+        return await interaction.response.send_message(
+            embed=discord.Embed(title="Loan already active", description=f"You already owe **{res.owed:,}**. Repay it first."),
+            ephemeral=True
+        )
 
+    fee, receive = res.fee, res.receive
     desc = (
         f"Principal: **{amount:,}**\n"
         f"Origination fee ({LOAN_ORIGINATION_FEE_PCT}%): **-{fee:,}**\n"
         f"You received: **{receive:,}**\n\n"
         f"Interest: **{LOAN_DAILY_INTEREST_PCT}% per day**, compounding."
     )
-    if newly:
-        desc += "\n\n🏆 **Achievement unlocked:** " + ", ".join([f"{n} (+{r:,})" for n, r in newly])
+    if res.newly:
+        desc += fmt_unlocked(res.newly)
     await interaction.response.send_message(embed=discord.Embed(title="Loan taken", description=desc))
 
 @loan.command(name="status", description="Check your loan balance (accrues interest).")
@@ -2289,13 +2773,7 @@ async def loan_status(interaction: discord.Interaction):
     if guild_err:
         return await interaction.response.send_message(embed=guild_err, ephemeral=True)
 
-    now = int(time.time())
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        accrue_loan(conn, interaction.guild.id, interaction.user.id, now)
-        row = loan_row(conn, interaction.guild.id, interaction.user.id)
-        conn.commit()
-
+    row = await _db(_do_loan_status, interaction.guild.id, interaction.user.id, int(time.time()))
     if not row or int(row["balance"]) <= 0:
         return await interaction.response.send_message(embed=discord.Embed(title="Loan status", description="You have **no active loan**."))
 
@@ -2317,52 +2795,30 @@ async def loan_repay(interaction: discord.Interaction, amount: int):
     if amount <= 0:
         return await interaction.response.send_message(embed=discord.Embed(title="Invalid amount", description="Amount must be positive."), ephemeral=True)
 
-    now = int(time.time())
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        accrue_loan(conn, interaction.guild.id, interaction.user.id, now)
-        row = loan_row(conn, interaction.guild.id, interaction.user.id)
-        if not row or int(row["balance"]) <= 0:
-            conn.rollback()
-            return await interaction.response.send_message(embed=discord.Embed(title="No loan", description="You have no active loan."), ephemeral=True)
-
-        bal = int(row["balance"])
-        u = get_user(conn, interaction.guild.id, interaction.user.id)
-        wallet = int(u["wallet"])
-        pay = min(amount, wallet, bal)
-
-        if pay <= 0:
-            conn.rollback()
-            return await interaction.response.send_message("You don't have coins to repay.", ephemeral=True)
-
-        update_wallet(conn, interaction.guild.id, interaction.user.id, -pay)
-        new_bal = bal - pay
-
-        if new_bal <= 0:
-            clear_loan(conn, interaction.guild.id, interaction.user.id)
-            newly = []
-            if achievements_enabled(conn, interaction.guild.id):
-                r = unlock_achievement(conn, interaction.guild.id, interaction.user.id, "loan_paid")
-                if r is not None:
-                    update_wallet(conn, interaction.guild.id, interaction.user.id, r)
-                    newly.append(("Paid in Blood", r))
-            conn.commit()
-            desc = f"Paid **{pay:,}**. Loan is **fully repaid**."
-            if newly:
-                desc += "\n\n🏆 **Achievement unlocked:** " + ", ".join([f"{n} (+{r:,})" for n, r in newly])
-            return await interaction.response.send_message(embed=discord.Embed(title="Loan repaid", description=desc))
+    res = await _db(_do_loan_repay, interaction.guild.id, interaction.user.id, amount, int(time.time()))
+    if res.no_loan:
+        return await interaction.response.send_message(embed=discord.Embed(title="No loan", description="You have no active loan."), ephemeral=True)
+    if res.pay <= 0:
+        return await interaction.response.send_message("You don't have coins to repay.", ephemeral=True)
 
-        conn.execute("UPDATE loans SET balance=? WHERE guild_id=? AND user_id=?", (new_bal, str(interaction.guild.id), str(interaction.user.id)))
-        conn.commit()
+    if res.new_bal <= 0:
+        desc = f"Paid **{res.pay:,}**. Loan is **fully repaid**."
+        if res.newly:
+            desc += fmt_unlocked(res.newly)
+        return await interaction.response.send_message(embed=discord.Embed(title="Loan repaid", description=desc))
 
     await interaction.response.send_message(embed=discord.Embed(
         title="Loan repaid",
-        description=f"Paid **{pay:,}**.\nRemaining balance: **{new_bal:,}**"
+        description=f"Paid **{res.pay:,}**.\nRemaining balance: **{res.new_bal:,}**"
     ))
 
 # ----------------------------
 # STATS / ACHIEVEMENTS / LEADERBOARD
 # ----------------------------
+def _do_peek_user(guild_id: int, user_id: int) -> Optional[sqlite3.Row]:
+    with db_connect() as conn:
+        return peek_user(conn, guild_id, user_id)
+
 @bot.tree.command(name="stats", description="View your casino stats (roulette + blackjack + slots + holdem).")
 @app_commands.describe(user="Optional: view someone else's stats")
 async def stats(interaction: discord.Interaction, user: Optional[discord.Member] = None):
@@ -2371,8 +2827,9 @@ async def stats(interaction: discord.Interaction, user: Optional[discord.Member]
         return await interaction.response.send_message(embed=guild_err, ephemeral=True)
 
     target = user or interaction.user
-    with db_connect() as conn:
-        row = get_user(conn, interaction.guild.id, target.id)
+    row = await _db(_do_peek_user, interaction.guild.id, target.id)
+    if row is None:
+        row = defaultdict(int)  # every guild_users column defaults to 0
 
     wallet = int(row["wallet"])
     streak = int(row["daily_streak"])
@@ -2389,43 +2846,28 @@ async def stats(interaction: discord.Interaction, user: Optional[discord.Member]
     s_plays = int(row["slots_plays"]); s_profit = int(row["slots_profit"]); s_big = int(row["slots_biggest_win"])
     h_plays = int(row["he_plays"]); h_wins = int(row["he_wins"]); h_profit = int(row["he_profit"])
 
-    embed = discord.Embed(title="Casino Stats", description=f"Stats for **{target.mention}**")
-    embed.add_field(name="Balance", value=f"**{wallet:,}** coins", inline=True)
-    embed.add_field(name="Daily Streak", value=f"**{streak}**", inline=True)
-
-    embed.add_field(
-        name="Roulette",
-        value=(
-            f"Plays: **{plays:,}** | Win rate: **{r_win_rate:.1f}%**\n"
-            f"W/L: **{wins:,}**/**{losses:,}** | Wagered: **{wagered:,}**\n"
-            f"Profit: **{profit:+,}** | Biggest: **{biggest_win:+,}**"
-        ),
-        inline=False
-    )
-
-    embed.add_field(
-        name="Blackjack",
-        value=(
-            f"Plays: **{bj_plays:,}** | Win rate: **{b_win_rate:.1f}%**\n"
-            f"W/L/P: **{bj_wins:,}**/**{bj_losses:,}**/**{bj_pushes:,}** | Wagered: **{bj_wagered:,}**\n"
-            f"Profit: **{bj_profit:+,}** | Biggest: **{bj_big:+,}**"
-        ),
-        inline=False
-    )
-
-    embed.add_field(
-        name="Slots",
-        value=f"Plays: **{s_plays:,}** | Profit: **{s_profit:+,}** | Biggest: **{s_big:+,}**",
-        inline=False
-    )
-
-    embed.add_field(
-        name="Hold'em",
-        value=f"Hands: **{h_plays:,}** | Wins: **{h_wins:,}** | Profit: **{h_profit:+,}**",
-        inline=False
-    )
+    # one description instead of six embed fields; well under the 4096-char limit
+    parts = [
+        f"Stats for **{target.mention}**\n"
+        f"Balance: **{wallet:,}** coins | Daily Streak: **{streak}**",
+        "**Roulette**\n"
+        f"Plays: **{plays:,}** | Win rate: **{r_win_rate:.1f}%**\n"
+        f"W/L: **{wins:,}**/**{losses:,}** | Wagered: **{wagered:,}**\n"
+        f"Profit: **{profit:+,}** | Biggest: **{biggest_win:+,}**",
+        "**Blackjack**\n"
+        f"Plays: **{bj_plays:,}** | Win rate: **{b_win_rate:.1f}%**\n"
+        f"W/L/P: **{bj_wins:,}**/**{bj_losses:,}**/**{bj_pushes:,}** | Wagered: **{bj_wagered:,}**\n"
+        f"Profit: **{bj_profit:+,}** | Biggest: **{bj_big:+,}**",
+        "**Slots**\n"
+        f"Plays: **{s_plays:,}** | Profit: **{s_profit:+,}** | Biggest: **{s_big:+,}**",
+        "**Hold'em**\n"
+        f"Hands: **{h_plays:,}** | Wins: **{h_wins:,}** | Profit: **{h_profit:+,}**",
+    ]
+    await interaction.response.send_message(embed=discord.Embed(title="Casino Stats", description="\n\n".join(parts)))
 
-    await interaction.response.send_message(embed=embed)
+def _do_achievements(guild_id: int, user_id: int) -> List[sqlite3.Row]:
+    with db_connect() as conn:
+        return list_user_achievements(conn, guild_id, user_id)
 
 @bot.tree.command(name="achievements", description="Show your unlocked achievements.")
 @app_commands.describe(user="Optional: view someone else's achievements")
@@ -2434,15 +2876,16 @@ async def achievements_cmd(interaction: discord.Interaction, user: Optional[disc
     if guild_err:
         return await interaction.response.send_message(embed=guild_err, ephemeral=True)
 
+    await interaction.response.defer()
+
     target = user or interaction.user
-    with db_connect() as conn:
-        rows = list_user_achievements(conn, interaction.guild.id, target.id)
+    rows = await _db(_do_achievements, interaction.guild.id, target.id)
 
     if not rows:
-        return await interaction.response.send_message(embed=discord.Embed(title="Achievements", description=f"{target.mention} has no achievements yet."))
+        return await interaction.followup.send(embed=discord.Embed(title="Achievements", description=f"{target.mention} has no achievements yet."))
 
-    lines = [f"• **{r['name']}** — {r['description']}" for r in rows[:25]]
-    await interaction.response.send_message(embed=discord.Embed(title="Achievements", description=f"For {target.mention}\n\n" + "\n".join(lines)))
+    lines = [f"• **{r['name']}** — {r['description']}" for r in rows]
+    await interaction.followup.send(embed=discord.Embed(title="Achievements", description=f"For {target.mention}\n\n" + "\n".join(lines)))
 
 lb_choices = [
     app_commands.Choice(name="wealth (coins)", value="wallet"),
@@ -2453,6 +2896,30 @@ lb_choices = [
     app_commands.Choice(name="holdem profit", value="he_profit"),
 ]
 
+# value format per leaderboard metric (the metric is also the column name)
+_LB_FMT = {
+    "wallet": "**{:,}** coins",
+    "profit": "**{:+,}** profit",
+    "wins": "**{:,}** wins",
+    "bj_profit": "**{:+,}** profit",
+    "slots_profit": "**{:+,}** profit",
+    "he_profit": "**{:+,}** profit",
+}
+
+# rendered top-10 lines per (guild_id, metric); the caller's rank is always looked up fresh.
+# Writes to a metric column drop its key on commit (mark_lb_dirty); the TTL is a backstop.
+LB_CACHE_TTL_SECONDS = 30
+LB_CACHE_MAX = 512
+_lb_cache: Dict[Tuple[int, str], Tuple[List[str], float]] = {}
+
+def _do_user_rank(guild_id: int, user_id: int, metric: str) -> int:
+    with db_connect() as conn:
+        return user_rank(conn, guild_id, user_id, metric=metric)
+
+def _do_leaderboard(guild_id: int, user_id: int, metric: str) -> Tuple[List[sqlite3.Row], int]:
+    with db_connect() as conn:
+        return top_users_with_rank(conn, guild_id, user_id, metric=metric, limit=10)
+
 @bot.tree.command(name="leaderboard", description="Top 10 users by category.")
 @app_commands.describe(category="What to rank by")
 @app_commands.choices(category=lb_choices)
@@ -2461,6 +2928,9 @@ async def leaderboard(interaction: discord.Interaction, category: Optional[app_c
     if guild_err:
         return await interaction.response.send_message(embed=guild_err, ephemeral=True)
 
+    # the DB read and name lookups can outlast the 3s ack window on a cold cache
+    await interaction.response.defer()
+
     metric = category.value if category else "wallet"
     metric_label = {
         "wallet": "Wealth",
@@ -2471,38 +2941,37 @@ async def leaderboard(interaction: discord.Interaction, category: Optional[app_c
         "he_profit": "Hold'em Profit",
     }[metric]
 
-    with db_connect() as conn:
-        rows = top_users(conn, interaction.guild.id, metric=metric, limit=10)
-        my_rank = user_rank(conn, interaction.guild.id, interaction.user.id, metric=metric)
+    gid = interaction.guild.id
+    key = (gid, metric)
+    now = time.monotonic()
+    hit = _lb_cache.get(key)
+    if hit is not None and hit[1] > now:
+        # top 10 is fresh enough; only the caller's rank is looked up
+        lines = hit[0]
+        my_rank = await _db(_do_user_rank, gid, interaction.user.id, metric)
+        return await interaction.followup.send(embed=discord.Embed(
+            title=f"Leaderboard — {metric_label}",
+            description="\n".join(lines) + f"\n\nYour rank: **#{my_rank}**",
+        ))
+
+    rows, my_rank = await _db(_do_leaderboard, gid, interaction.user.id, metric)
 
     if not rows:
-        return await interaction.response.send_message(embed=discord.Embed(title="Leaderboard", description="No data yet. Claim /daily to start!"))
-
-    lines = []
-    for i, r in enumerate(rows, start=1):
-        uid = int(r["user_id"])
-        name = await resolve_display_name(interaction.guild, uid)
-
-        if metric == "wallet":
-            value = int(r["wallet"])
-            lines.append(f"**#{i}** — {name}: **{value:,}** coins")
-        elif metric == "profit":
-            value = int(r["profit"])
-            lines.append(f"**#{i}** — {name}: **{value:+,}** profit")
-        elif metric == "wins":
-            value = int(r["wins"])
-            lines.append(f"**#{i}** — {name}: **{value:,}** wins")
-        elif metric == "bj_profit":
-            value = int(r["bj_profit"])
-            lines.append(f"**#{i}** — {name}: **{value:+,}** profit")
-        elif metric == "slots_profit":
-            value = int(r["slots_profit"])
-            lines.append(f"**#{i}** — {name}: **{value:+,}** profit")
-        else:
-            value = int(r["he_profit"])
-            lines.append(f"**#{i}** — {name}: **{value:+,}** profit")
+        return await interaction.followup.send(embed=discord.Embed(title="Leaderboard", description="No data yet. Claim /daily to start!"))
 
-    await interaction.response.send_message(embed=discord.Embed(
+    names = await resolve_display_names(interaction.guild, [r["user_id"] for r in rows])
+
+    fmt = _LB_FMT[metric]
+    lines = [
+        f"**#{i}** — {names[r['user_id']]}: " + fmt.format(r["v"])
+        for i, r in enumerate(rows, start=1)
+    ]
+
+    if len(_lb_cache) >= LB_CACHE_MAX:
+        _lb_cache.clear()
+    _lb_cache[key] = (lines, now + LB_CACHE_TTL_SECONDS)
+
+    await interaction.followup.send(embed=discord.Embed(
         title=f"Leaderboard — {metric_label}",
         description="\n".join(lines) + f"\n\nYour rank: **#{my_rank}**",
     ))
@@ -2553,6 +3022,28 @@ def _eligible_members_from_target(
         uniq[m.id] = m
     return list(uniq.values())
 
+@dataclass
+class GiftCoinsResult:
+    short: bool = False         # total > wallet; nothing was written
+    wallet: int = 0             # sender's wallet before the gift
+
+def _do_gift_coins(guild_id: int, user_id: int, recipient_ids: List[int], amount: int) -> GiftCoinsResult:
+    total = amount * len(recipient_ids)
+    with db_connect() as conn, tx(conn):
+        bal = int(get_user(conn, guild_id, user_id)["wallet"])
+        if total > bal:
+            conn.rollback()
+            return GiftCoinsResult(short=True, wallet=bal)
+
+        # subtract total from sender
+        update_wallet(conn, guild_id, user_id, -total)
+
+        # add to each recipient
+        for rid in recipient_ids:
+            update_wallet(conn, guild_id, rid, amount)
+
+    return GiftCoinsResult(wallet=bal)
+
 @gift.command(name="coins", description="Gift coins to a user or to a role/@everyone (per-person).")
 @app_commands.describe(
     target="Who to gift to (member, role, or @everyone)",
@@ -2590,30 +3081,15 @@ async def gift_coins(
             ephemeral=True
         )
 
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-
-        sender = get_user(conn, interaction.guild.id, interaction.user.id)
-        bal = int(sender["wallet"])
-
-        if total > bal:
-            conn.rollback()
-            return await interaction.response.send_message(
-                embed=discord.Embed(
-                    title="Not enough coins",
-                    description=f"You have **{bal:,}** coins but need **{total:,}** to gift {len(recipients)} recipient(s)."
-                ),
-                ephemeral=True
-            )
-
-        # subtract total from sender
-        update_wallet(conn, interaction.guild.id, interaction.user.id, -total)
-
-        # add to each recipient
-        for m in recipients:
-            update_wallet(conn, interaction.guild.id, m.id, amount)
-
-        conn.commit()
+    res = await _db(_do_gift_coins, interaction.guild.id, interaction.user.id, [m.id for m in recipients], amount)
+    if res.short:
+        return await interaction.response.send_message(
+            embed=discord.Embed(
+                title="Not enough coins",
+                description=f"You have **{res.wallet:,}** coins but need **{total:,}** to gift {len(recipients)} recipient(s)."
+            ),
+            ephemeral=True
+        )
 
     # Pretty target label
     if isinstance(target, discord.Member):
@@ -2631,6 +3107,59 @@ async def gift_coins(
         )
     )
 
+@dataclass
+class GiftItemResult:
+    found: bool = True          # False: unknown item_id
+    collectible: bool = True    # False: the item can't be gifted
+    short: bool = False         # sender holds fewer than qty * recipients; nothing was written
+    have: int = 0
+    name: str = ""
+
+def _do_gift_item(guild_id: int, user_id: int, recipient_ids: List[int], item_id: str, qty: int) -> GiftItemResult:
+    total_qty = qty * len(recipient_ids)
+    with db_connect() as conn, tx(conn):
+        item = conn.execute("SELECT name, kind FROM items WHERE item_id=?", (item_id,)).fetchone()
+        if not item:
+            conn.rollback()
+            return GiftItemResult(found=False)
+
+        if str(item["kind"]) != "collectible":
+            conn.rollback()
+            return GiftItemResult(collectible=False)
+
+        have = conn.execute("""
+            SELECT qty FROM inventory
+            WHERE guild_id=? AND user_id=? AND item_id=?
+        """, (guild_id, user_id, item_id)).fetchone()
+
+        have_qty = int(have["qty"]) if have else 0
+        if total_qty > have_qty:
+            conn.rollback()
+            return GiftItemResult(short=True, have=have_qty)
+
+        # subtract from sender (total)
+        conn.execute("""
+            UPDATE inventory SET qty = qty - ?
+            WHERE guild_id=? AND user_id=? AND item_id=?
+        """, (total_qty, guild_id, user_id, item_id))
+
+        # add to each recipient
+        for rid in recipient_ids:
+            conn.execute("""
+                INSERT INTO inventory (guild_id, user_id, item_id, qty)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(guild_id, user_id, item_id)
+                DO UPDATE SET qty = qty + excluded.qty
+            """, (guild_id, rid, item_id, qty))
+
+        # cleanup zero rows
+        conn.execute("""
+            DELETE FROM inventory
+            WHERE guild_id=? AND user_id=? AND item_id=? AND qty <= 0
+        """, (guild_id, user_id, item_id))
+
+    return GiftItemResult(have=have_qty, name=str(item["name"]))
+
 @gift.command(name="item", description="Gift a collectible item to a user or to a role/@everyone (per-person).")
 @app_commands.describe(
     target="Who to gift to (member, role, or @everyone)",
@@ -2664,57 +3193,19 @@ async def gift_item(
         )
 
     total_qty = qty * len(recipients)
-
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-
-        item = conn.execute("SELECT name, kind FROM items WHERE item_id=?", (item_id,)).fetchone()
-        if not item:
-            conn.rollback()
-            return await interaction.response.send_message("That item_id doesn't exist.", ephemeral=True)
-
-        if str(item["kind"]) != "collectible":
-            conn.rollback()
-            return await interaction.response.send_message("Only collectibles can be gifted.", ephemeral=True)
-
-        have = conn.execute("""
-            SELECT qty FROM inventory
-            WHERE guild_id=? AND user_id=? AND item_id=?
-        """, (str(interaction.guild.id), str(interaction.user.id), item_id)).fetchone()
-
-        have_qty = int(have["qty"]) if have else 0
-        if total_qty > have_qty:
-            conn.rollback()
-            return await interaction.response.send_message(
-                embed=discord.Embed(
-                    title="Not enough items",
-                    description=f"You have **{have_qty}x** of `{item_id}` but need **{total_qty}x** to gift {len(recipients)} recipient(s)."
-                ),
-                ephemeral=True
-            )
-
-        # subtract from sender (total)
-        conn.execute("""
-            UPDATE inventory SET qty = qty - ?
-            WHERE guild_id=? AND user_id=? AND item_id=?
-        """, (total_qty, str(interaction.guild.id), str(interaction.user.id), item_id))
-
-        # add to each recipient
-        for m in recipients:
-            conn.execute("""
-                INSERT INTO inventory (guild_id, user_id, item_id, qty)
-                VALUES (?, ?, ?, ?)
-                ON CONFLICT(guild_id, user_id, item_id)
-                DO UPDATE SET qty = qty + excluded.qty
-            """, (str(interaction.guild.id), str(m.id), item_id, qty))
-
-        # cleanup zero rows
-        conn.execute("""
-            DELETE FROM inventory
-            WHERE guild_id=? AND user_id=? AND item_id=? AND qty <= 0
-        """, (str(interaction.guild.id), str(interaction.user.id), item_id))
-
-        conn.commit()
+    res = await _db(_do_gift_item, interaction.guild.id, interaction.user.id, [m.id for m in recipients], item_id, qty)
+    if not res.found:
+        return await interaction.response.send_message("That item_id doesn't exist.", ephemeral=True)
+    if not res.collectible:
+        return await interaction.response.send_message("Only collectibles can be gifted.", ephemeral=True)
+    if res.short:
+        return await interaction.response.send_message(
+            embed=discord.Embed(
+                title="Not enough items",
+                description=f"You have **{res.have}x** of `{item_id}` but need **{total_qty}x** to gift {len(recipients)} recipient(s)."
+            ),
+            ephemeral=True
+        )
 
     if isinstance(target, discord.Member):
         target_label = target.mention
@@ -2725,7 +3216,7 @@ async def gift_item(
         embed=discord.Embed(
             title="Gift Sent",
             description=(
-                f"You gifted **{qty}x** **{item['name']}** (`{item_id}`) to **{len(recipients)}** recipient(s) in {target_label}.\n"
+                f"You gifted **{qty}x** **{res.name}** (`{item_id}`) to **{len(recipients)}** recipient(s) in {target_label}.\n"
                 f"Total items sent: **{total_qty}x**."
             )
         )
@@ -2737,6 +3228,14 @@ async def gift_item(
 admin = app_commands.Group(name="admin", description="Admin economy controls (manage server).")
 bot.tree.add_command(admin)
 
+def _do_admin_give(guild_id: int, user_id: int, amount: int) -> int:
+    with db_connect() as conn, tx(conn):
+        return update_wallet(conn, guild_id, user_id, amount)
+
+def _do_admin_take(guild_id: int, user_id: int, amount: int) -> Tuple[int, int]:
+    with db_connect() as conn, tx(conn):
+        return take_wallet_clamped(conn, guild_id, user_id, amount)
+
 @admin.command(name="give", description="Give coins to a user.")
 @app_commands.describe(user="User to give coins to", amount="Amount to give")
 async def admin_give(interaction: discord.Interaction, user: discord.Member, amount: int):
@@ -2748,10 +3247,7 @@ async def admin_give(interaction: discord.Interaction, user: discord.Member, amo
     if amount <= 0:
         return await interaction.response.send_message("Amount must be positive.", ephemeral=True)
 
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        new_wallet = update_wallet(conn, interaction.guild.id, user.id, amount)
-        conn.commit()
+    new_wallet = await _db(_do_admin_give, interaction.guild.id, user.id, amount)
 
     await interaction.response.send_message(embed=discord.Embed(
         title="Admin Give",
@@ -2769,13 +3265,9 @@ async def admin_take(interaction: discord.Interaction, user: discord.Member, amo
     if amount <= 0:
         return await interaction.response.send_message("Amount must be positive.", ephemeral=True)
 
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        row = get_user(conn, interaction.guild.id, user.id)
-        wallet = int(row["wallet"])
-        take = min(amount, wallet)
-        new_wallet = update_wallet(conn, interaction.guild.id, user.id, -take)
-        conn.commit()
+    take, new_wallet = await _db(_do_admin_take, interaction.guild.id, user.id, amount)
+    if take == 0:
+        return await interaction.response.send_message(f"{user.mention} has no coins.", ephemeral=True)
 
     await interaction.response.send_message(embed=discord.Embed(
         title="Admin Take",
@@ -2788,6 +3280,10 @@ async def admin_take(interaction: discord.Interaction, user: discord.Member, amo
 settings = app_commands.Group(name="settings", description="Server settings (admin).")
 bot.tree.add_command(settings)
 
+def _do_set_achievements(guild_id: int, enabled: bool) -> None:
+    with db_connect() as conn, tx(conn):
+        set_achievements_enabled(conn, guild_id, enabled)
+
 @settings.command(name="achievements", description="Enable/disable achievements for this server.")
 @app_commands.describe(enabled="true to enable, false to disable")
 async def settings_achievements(interaction: discord.Interaction, enabled: bool):
@@ -2797,10 +3293,7 @@ async def settings_achievements(interaction: discord.Interaction, enabled: bool)
     if not is_admin_member(interaction.user):
         return await interaction.response.send_message("You need **Manage Server** or **Administrator**.", ephemeral=True)
 
-    with db_connect() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        set_achievements_enabled(conn, interaction.guild.id, enabled)
-        conn.commit()
+    await _db(_do_set_achievements, interaction.guild.id, enabled)
 
     await interaction.response.send_message(embed=discord.Embed(
         title="Settings updated",
@@ -2811,8 +3304,13 @@ async def settings_achievements(interaction: discord.Interaction, enabled: bool)
 # ENTRYPOINT
 # ----------------------------
 if __name__ == "__main__":
+    listener = setup_logging()
     db_init()
     token = os.getenv("DISCORD_TOKEN")
     if not token:
         raise RuntimeError("Set DISCORD_TOKEN environment variable.")
-    bot.run(token)
+    try:
+        # log_handler=None: discord.py logs propagate to the queue handler above
+        bot.run(token, log_handler=None)
+    finally:
+        listener.stop()